@@ -68,6 +68,7 @@
 # this will help in making the Python code more structured automatically (help adhere to good coding practices)
 
 
+import os
 import warnings
 
 warnings.filterwarnings("ignore")
@@ -90,12 +91,30 @@ pd.set_option("display.max_rows", 200)
 # setting the precision of floating numbers to 5 decimal points
 pd.set_option("display.float_format", lambda x: "%.5f" % x)
 
-# Library to split data
-from sklearn.model_selection import train_test_split
+# Libraries to load, clean, encode and split the booking extract
+from innhotels.loader import DEFAULT_DATA_PATH, load_bookings
+from innhotels.cache import load_clean_bookings, price_upper_whisker
+from innhotels.schema import optimize_dtypes
+from innhotels.encoding import DummyEncoder
+from innhotels.split import DesignMatrix, SplitIndex
+from innhotels.store import DEFAULT_STORE_DIR, fit_estimator, save_feature_store
+from innhotels.summary import summarize_files
+from innhotels.incremental import refresh_aggregates
+from innhotels.sketch import KLLSketch
+from innhotels.dedup import RowHashIndex
+from innhotels.report import render_report
+from innhotels.cube import CountCube
+from innhotels.correlation import CovarianceAccumulator
+from innhotels.scoring import DEFAULT_MODEL_PATH, export_logit
+from innhotels.segments import SegmentAnalytics
+from innhotels.features import add_derived_features, subset_mask
+from innhotels.sampling import stratified_sample
+from innhotels.selection import backward_elimination, stepwise_selection
+from innhotels.vif import VIFCalculator
+from innhotels.logit import OnlineLogit, fit_logit
 
 # To build model for prediction
 import statsmodels.stats.api as sms
-from statsmodels.stats.outliers_influence import variance_inflation_factor
 import statsmodels.api as sm
 from statsmodels.tools.tools import add_constant
 from sklearn.tree import DecisionTreeClassifier
@@ -103,6 +122,10 @@ from sklearn import tree
 
 # To tune different models
 from sklearn.model_selection import GridSearchCV
+from joblib import Parallel, delayed
+
+# number of worker processes used to tune the trees (-1 uses every core)
+N_JOBS = -1
 
 
 # To get diferent metric scores
@@ -113,7 +136,6 @@ from sklearn.metrics import (
     precision_score,
     confusion_matrix,
     roc_auc_score,
-    plot_confusion_matrix,
     precision_recall_curve,
     roc_curve,
     make_scorer,
@@ -125,14 +147,9 @@ from sklearn.metrics import (
 # In[5]:
 
 
-hotel = pd.read_csv(r'C:\Users\Luke Harris\OneDrive\Desktop\Great Learning\Section 4\INNHotelsGroup.csv') 
-
-
-# In[6]:
-
-
-# copying data to another variable to avoid any changes to original data
-data = hotel.copy()
+# path or glob of the extract(s), set INNHOTELS_DATA to point at another location
+# chunksize streams large multi-property extracts instead of parsing them in one go
+data = load_bookings(DEFAULT_DATA_PATH, chunksize=500_000)
 
 
 # ### View the first and last 5 rows of the dataset
@@ -165,6 +182,14 @@ data.shape ##  view dimensions of the data
 data.info()
 
 
+# **Let's store every column in the smallest type that holds its values, this makes the whole pipeline run on a much smaller frame.**
+
+# In[ ]:
+
+
+data = optimize_dtypes(data)  ## print the memory used by each column before and after
+
+
 # In[11]:
 
 
@@ -172,6 +197,15 @@ data.info()
 data.duplicated().sum() ##  check duplicate entries in the data
 
 
+# **Once Booking_ID is dropped, replays of the same booking across feed files can no longer be told apart, so incremental loads check every new chunk against a persisted index of row hashes (all raw columns, Booking_ID included). Each check is a lookup, not a rescan of the history.**
+
+# In[ ]:
+
+
+# a fresh index over this extract flags the same rows as data.duplicated()
+RowHashIndex().add(data).sum()
+
+
 # **Let's drop the Booking_ID column first before we proceed forward**.
 
 # In[12]:
@@ -202,41 +236,21 @@ data.head()
 data.describe().T ##  print the statistical summary of the data
 
 
+# **For booking histories larger than memory, the same summaries (describe, value counts, crosstabs against booking status, monthly counts) come from a single chunked pass over the extract files, merged across worker processes.**
+
+# In[ ]:
+
+
+eda_summary = summarize_files(DEFAULT_DATA_PATH, chunksize=500_000, n_jobs=N_JOBS)
+eda_summary.describe().T
+
+
 # ### Univariate Analysis
 
 # In[16]:
 
 
-def histogram_boxplot(data, feature, figsize=(15, 10), kde=False, bins=None):
-    """
-    Boxplot and histogram combined
-
-    data: dataframe
-    feature: dataframe column
-    figsize: size of figure (default (15,10))
-    kde: whether to show the density curve (default False)
-    bins: number of bins for histogram (default None)
-    """
-    f2, (ax_box2, ax_hist2) = plt.subplots(
-        nrows=2,  # Number of rows of the subplot grid= 2
-        sharex=True,  # x-axis will be shared among all subplots
-        gridspec_kw={"height_ratios": (0.25, 0.75)},
-        figsize=figsize,
-    )  # creating the 2 subplots
-    sns.boxplot(
-        data=data, x=feature, ax=ax_box2, showmeans=True, color="violet"
-    )  # boxplot will be created and a triangle will indicate the mean value of the column
-    sns.histplot(
-        data=data, x=feature, kde=kde, ax=ax_hist2, bins=bins
-    ) if bins else sns.histplot(
-        data=data, x=feature, kde=kde, ax=ax_hist2
-    )  # For histogram
-    ax_hist2.axvline(
-        data[feature].mean(), color="green", linestyle="--"
-    )  # Add mean to the histogram
-    ax_hist2.axvline(
-        data[feature].median(), color="black", linestyle="-"
-    )  # Add median to the histogram
+from innhotels.plots import histogram_boxplot  # boxplot and histogram combined
 
 
 # ### Observations on lead time
@@ -284,11 +298,23 @@ Upper_Whisker = Q3 + 1.5 * IQR
 Upper_Whisker
 
 
+# **On extracts too large to sort in memory, the quartiles come from a mergeable quantile sketch filled chunk by chunk (the chunked and incremental loads use the same sketch). It is exact up to k values and within about 1% rank error beyond that.**
+
+# In[ ]:
+
+
+price_sketch = KLLSketch(k=400)
+price_sketch.update(data["avg_price_per_room"])
+price_upper_whisker(price_sketch)
+
+
 # In[158]:
 
 
 # assigning the outliers the value of upper whisker
-data.loc[data["avg_price_per_room"] >= 500, "avg_price_per_room"] = Upper_Whisker
+data.loc[data["avg_price_per_room"] >= 500, "avg_price_per_room"] = data[
+    "avg_price_per_room"
+].dtype.type(Upper_Whisker)  # cast to the column type (float32 after compaction)
 
 
 # ### Observations on number of previous booking cancellations
@@ -313,53 +339,7 @@ histogram_boxplot(data, 'no_of_previous_bookings_not_canceled')  ## create histo
 # function to create labeled barplots
 
 
-def labeled_barplot(data, feature, perc=False, n=None):
-    """
-    Barplot with percentage at the top
-
-    data: dataframe
-    feature: dataframe column
-    perc: whether to display percentages instead of count (default is False)
-    n: displays the top n category levels (default is None, i.e., display all levels)
-    """
-
-    total = len(data[feature])  # length of the column
-    count = data[feature].nunique()
-    if n is None:
-        plt.figure(figsize=(count + 2, 6))
-    else:
-        plt.figure(figsize=(n + 2, 6))
-
-    plt.xticks(rotation=90, fontsize=15)
-    ax = sns.countplot(
-        data=data,
-        x=feature,
-        palette="Paired",
-        order=data[feature].value_counts().index[:n],
-    )
-
-    for p in ax.patches:
-        if perc == True:
-            label = "{:.1f}%".format(
-                100 * p.get_height() / total
-            )  # percentage of each class of the category
-        else:
-            label = p.get_height()  # count of each level of the category
-
-        x = p.get_x() + p.get_width() / 2  # width of the plot
-        y = p.get_height()  # height of the plot
-
-        ax.annotate(
-            label,
-            (x, y),
-            ha="center",
-            va="center",
-            size=12,
-            xytext=(0, 5),
-            textcoords="offset points",
-        )  # annotate the percentage
-
-    plt.show()  # show the plot
+from innhotels.plots import labeled_barplot  # barplot with percentage at the top
 
 
 # ### Observations on number of adults
@@ -460,21 +440,35 @@ labeled_barplot(data, 'booking_status')  ## create labeled_barplot for booking s
 # In[38]:
 
 
-data["booking_status"] = data["booking_status"].apply(
-    lambda x: 1 if x == "Canceled" else 0
-)
+data["booking_status"] = (data["booking_status"] == "Canceled").astype(int)
 
 
 # ### Bivariate Analysis
 
+# **On multi-million-row histories the plots below that draw every booking can use a reproducible stratified sample on booking status and market segment (set INNHOTELS_EDA_SAMPLE to its size). The correlations and the tables of the stacked barplots always come from the full data.**
+
+# In[ ]:
+
+
+EDA_SAMPLE_SIZE = int(os.environ.get("INNHOTELS_EDA_SAMPLE", "0"))
+plot_data = data
+if 0 < EDA_SAMPLE_SIZE < len(data):
+    plot_data = stratified_sample(
+        data, EDA_SAMPLE_SIZE, strata=["booking_status", "market_segment_type"]
+    )
+
+
 # In[39]:
 
 
 cols_list = data.select_dtypes(include=np.number).columns.tolist()
 
+# streaming Pearson matrix, the same accumulator merges chunks or partitions of larger histories
+corr_matrix = CovarianceAccumulator(cols_list).update(data).corr()
+
 plt.figure(figsize=(12, 7))
 sns.heatmap(
-    data[cols_list].corr(), annot=True, vmin=-1, vmax=1, fmt=".2f", cmap="Spectral"
+    corr_matrix, annot=True, vmin=-1, vmax=1, fmt=".2f", cmap="Spectral"
 )
 plt.show()
 
@@ -487,76 +481,18 @@ plt.show()
 ### function to plot distributions wrt target
 
 
-def distribution_plot_wrt_target(data, predictor, target):
-
-    fig, axs = plt.subplots(2, 2, figsize=(12, 10))
-
-    target_uniq = data[target].unique()
-
-    axs[0, 0].set_title("Distribution of target for target=" + str(target_uniq[0]))
-    sns.histplot(
-        data=data[data[target] == target_uniq[0]],
-        x=predictor,
-        kde=True,
-        ax=axs[0, 0],
-        color="teal",
-        stat="density",
-    )
-
-    axs[0, 1].set_title("Distribution of target for target=" + str(target_uniq[1]))
-    sns.histplot(
-        data=data[data[target] == target_uniq[1]],
-        x=predictor,
-        kde=True,
-        ax=axs[0, 1],
-        color="orange",
-        stat="density",
-    )
-
-    axs[1, 0].set_title("Boxplot w.r.t target")
-    sns.boxplot(data=data, x=target, y=predictor, ax=axs[1, 0], palette="gist_rainbow")
-
-    axs[1, 1].set_title("Boxplot (without outliers) w.r.t target")
-    sns.boxplot(
-        data=data,
-        x=target,
-        y=predictor,
-        ax=axs[1, 1],
-        showfliers=False,
-        palette="gist_rainbow",
-    )
-
-    plt.tight_layout()
-    plt.show()
+from innhotels.plots import distribution_plot_wrt_target
 
 
 # In[41]:
 
 
-def stacked_barplot(data, predictor, target):
-    """
-    Print the category counts and plot a stacked bar chart
+from innhotels.plots import stacked_barplot  # category counts and stacked bar chart
 
-    data: dataframe
-    predictor: independent variable
-    target: target variable
-    """
-    count = data[predictor].nunique()
-    sorter = data[target].value_counts().index[-1]
-    tab1 = pd.crosstab(data[predictor], data[target], margins=True).sort_values(
-        by=sorter, ascending=False
-    )
-    print(tab1)
-    print("-" * 120)
-    tab = pd.crosstab(data[predictor], data[target], normalize="index").sort_values(
-        by=sorter, ascending=False
-    )
-    tab.plot(kind="bar", stacked=True, figsize=(count + 5, 5))
-    plt.legend(
-        loc="lower left", frameon=False,
-    )
-    plt.legend(loc="upper left", bbox_to_anchor=(1, 1))
-    plt.show()
+
+# counting every categorical and low-cardinality column against booking status in one pass,
+# the stacked barplots of the full data below are read from this cube
+cube = CountCube.from_frame(data, "booking_status")
 
 
 # **Hotel rates are dynamic and change according to demand and customer demographics. Let's see how prices vary across different market segments**
@@ -566,7 +502,7 @@ def stacked_barplot(data, predictor, target):
 
 plt.figure(figsize=(10, 6))
 sns.boxplot(
-    data=data, x="market_segment_type", y="avg_price_per_room", palette="gist_rainbow"
+    data=plot_data, x="market_segment_type", y="avg_price_per_room", palette="gist_rainbow"
 )
 plt.show()
 
@@ -576,7 +512,7 @@ plt.show()
 # In[43]:
 
 
-stacked_barplot(data, "market_segment_type", "booking_status")
+stacked_barplot(data, "market_segment_type", "booking_status", cube=cube)
 
 
 # **Many guests have special requirements when booking a hotel room. Let's see how it impacts cancellations**
@@ -584,7 +520,7 @@ stacked_barplot(data, "market_segment_type", "booking_status")
 # In[44]:
 
 
-stacked_barplot(data, 'no_of_special_requests', 'booking_status') ## plot stacked barplot for no of special requests and booking status
+stacked_barplot(data, 'no_of_special_requests', 'booking_status', cube=cube) ## plot stacked barplot for no of special requests and booking status
 
 
 # **Let's see if the special requests made by the customers impacts the prices of a room**
@@ -594,7 +530,7 @@ stacked_barplot(data, 'no_of_special_requests', 'booking_status') ## plot stacke
 
 plt.figure(figsize=(10, 5))
 sns.boxplot(
-    data=data,
+    data=plot_data,
     x="no_of_special_requests",
     y="avg_price_per_room",
     palette="gist_rainbow",
@@ -607,7 +543,7 @@ plt.show()
 # In[46]:
 
 
-distribution_plot_wrt_target(data, "avg_price_per_room", "booking_status")
+distribution_plot_wrt_target(plot_data, "avg_price_per_room", "booking_status")
 
 
 # **There is a positive correlation between booking status and lead time also. Let's analyze it further**
@@ -615,7 +551,7 @@ distribution_plot_wrt_target(data, "avg_price_per_room", "booking_status")
 # In[47]:
 
 
-distribution_plot_wrt_target(data, 'booking_status', 'lead_time') ## find distribution of lead time wrt booking status
+distribution_plot_wrt_target(plot_data, 'booking_status', 'lead_time') ## find distribution of lead time wrt booking status
 
 
 # **Generally people travel with their spouse and children for vacations or other activities. Let's create a new dataframe of the customers who traveled with their families and analyze the impact on booking status.**
@@ -623,16 +559,18 @@ distribution_plot_wrt_target(data, 'booking_status', 'lead_time') ## find distri
 # In[48]:
 
 
-family_data = data[(data["no_of_children"] >= 0) & (data["no_of_adults"] > 1)]
-family_data.shape
+# the derived features are vectorised columns of the main frame, the subsets are row masks
+add_derived_features(data, ["no_of_family_members", "total_days"])
+
+family_mask = subset_mask(data, "family")
+family_mask.sum()  # number of family bookings
 
 
 # In[49]:
 
 
-family_data["no_of_family_members"] = (
-    family_data["no_of_adults"] + family_data["no_of_children"]
-)
+# only the two plotted columns of the family bookings are copied
+family_data = data.loc[family_mask, ["no_of_family_members", "booking_status"]]
 
 
 # In[50]:
@@ -646,16 +584,14 @@ stacked_barplot(family_data, "no_of_family_members","booking_status") ## plot st
 # In[51]:
 
 
-stay_data = data[(data["no_of_week_nights"] > 0) & (data["no_of_weekend_nights"] > 0)]
-stay_data.shape
+stay_mask = subset_mask(data, "stay")
+stay_mask.sum()  # number of bookings with both week and weekend nights
 
 
 # In[52]:
 
 
-stay_data["total_days"] = (
-    stay_data["no_of_week_nights"] + stay_data["no_of_weekend_nights"]
-)
+stay_data = data.loc[stay_mask, ["total_days", "repeated_guest", "booking_status"]]
 
 
 # In[53]:
@@ -677,12 +613,12 @@ stacked_barplot(stay_data, 'repeated_guest', 'booking_status') ## plot stacked b
 # In[55]:
 
 
-# grouping the data on arrival months and extracting the count of bookings
-monthly_data = data.groupby(["arrival_month"])["booking_status"].count()
+# counts, cancellation rate, mean price and revenue at risk of every segment in one pass
+segments = SegmentAnalytics(data)
 
 # creating a dataframe with months and count of customers in each month
-monthly_data = pd.DataFrame(
-    {"Month": list(monthly_data.index), "Guests": list(monthly_data.values)}
+monthly_data = (
+    segments.table("arrival_month")["bookings"].rename_axis("Month").reset_index(name="Guests")
 )
 
 # plotting the trend over different months
@@ -696,7 +632,26 @@ plt.show()
 # In[56]:
 
 
-stacked_barplot(data, 'arrival_month', 'booking_status') ## plot stacked barplot for arrival month and booking status
+stacked_barplot(data, 'arrival_month', 'booking_status', cube=cube) ## plot stacked barplot for arrival month and booking status
+
+
+# **New feed files are folded into persisted aggregates (files already applied are skipped), so the cancellation rates by market segment and by month refresh from the new batch only.**
+
+# In[ ]:
+
+
+aggregates = refresh_aggregates(DEFAULT_DATA_PATH)
+print(aggregates.cancellation_rate("market_segment_type"))
+aggregates.cancellation_rate("arrival_month")
+
+
+# **Revenue at risk (price per night times the nights booked, for the canceled bookings) by market segment, and by room type for the online segment.**
+
+# In[ ]:
+
+
+print(segments.table("market_segment_type"))
+segments.table("room_type_reserved", market_segment_type="Online")
 
 
 # **As hotel room prices are dynamic, Let's see how the prices vary across different months**
@@ -705,10 +660,25 @@ stacked_barplot(data, 'arrival_month', 'booking_status') ## plot stacked barplot
 
 
 plt.figure(figsize=(10, 5))
-sns.lineplot(data=data, x="arrival_month", y="avg_price_per_room")
+sns.lineplot(data=plot_data, x="arrival_month", y="avg_price_per_room")
 plt.show()
 
 
+# **For the nightly refresh on a headless server, every plot above (for every relevant column) can be rendered in a process pool to image files with an index page. Set INNHOTELS_EDA_REPORT to the output directory to do so.**
+
+# In[ ]:
+
+
+if os.environ.get("INNHOTELS_EDA_REPORT"):
+    render_report(
+        data,
+        os.environ["INNHOTELS_EDA_REPORT"],
+        fmt="png",
+        n_jobs=N_JOBS,
+        sample_size=EDA_SAMPLE_SIZE or None,
+    )
+
+
 # ### Outlier Check
 # 
 # - Let's check for outliers in the data.
@@ -738,16 +708,37 @@ plt.show()
 # - Before we proceed to build a model, we'll have to encode categorical features.
 # - We'll split the data into train and test to be able to evaluate the model that we build on the train data.
 
+# **The cleaning done above is cached on disk as a columnar file keyed by the source file and the cleaning parameters, so the modelling stages can start from it directly on later runs.**
+
+# In[ ]:
+
+
+data = load_clean_bookings(DEFAULT_DATA_PATH)
+
+# derived features given to the models; none by default, as each is the exact sum of
+# two predictors already in the design (e.g. add "total_days" and drop its sources)
+model_derived_features = []
+add_derived_features(data, model_derived_features)
+
+
 # In[76]:
 
 
 X = data.drop(["booking_status"], axis=1)
 Y = data["booking_status"]
 
-X = pd.get_dummies(X, drop_first=True)  ## create dummies for X 
+# the encoder learns the category levels once and is reused by every model and for scoring
+encoder = DummyEncoder(drop_first=True).fit(X)
+
+# Splitting data in train and test sets once, in the ratio 70:30 with random_state = 1
+split = SplitIndex(len(X), test_size=0.30, random_state=1)
 
-# Splitting data in train and test sets
-X_train, X_test, y_train, y_test = train_test_split(X, Y, test_size=0.30, random_state=1) ## split the data into train test in the ratio 70:30 with random_state = 1
+# encoding once into a single matrix (train rows first, constant first) shared by every model
+design = DesignMatrix(encoder, X, Y, split, add_constant=True)
+del X, Y
+
+X_train, X_test = design.train(drop_constant=True), design.test(drop_constant=True)
+y_train, y_test = design.y_train, design.y_test
 
 
 # In[77]:
@@ -855,16 +846,9 @@ def confusion_matrix_statsmodels(model, predictors, target, threshold=0.5):
 # In[80]:
 
 
-X = data.drop(["booking_status"], axis=1)
-Y = data["booking_status"]
-
-# adding constant
-X = sm.add_constant(X) ## add constant to X 
-
-X = pd.get_dummies(X, drop_first=True) ## create dummies for X 
-
-# Splitting data in train and test sets
-X_train, X_test, y_train, y_test = train_test_split(X, Y, test_size=0.3, random_state=1) ## split the data into train test in the ratio 70:30 with random_state = 1
+# the statsmodels models use the shared design matrix with the constant column
+X_train, X_test = design.train(), design.test()
+y_train, y_test = design.y_train, design.y_test
 
 
 # In[67]:
@@ -877,7 +861,7 @@ import statsmodels.api as sm
 
 
 # fitting logistic regression model
-logit = sm.Logit(y_train, X_train.astype(float))
+logit = sm.Logit(y_train, X_train)  # the design matrix is already float
 lg = logit.fit(disp=False)
 
 print(lg.summary()) ## print summary of the model
@@ -900,11 +884,8 @@ def checking_vif(predictors):
     vif = pd.DataFrame()
     vif["feature"] = predictors.columns
 
-    # calculating VIF for each feature
-    vif["VIF"] = [
-        variance_inflation_factor(predictors.values, i)
-        for i in range(len(predictors.columns))
-    ]
+    # calculating VIF for each feature, all at once from the inverse correlation matrix
+    vif["VIF"] = VIFCalculator(predictors).vif().to_numpy()
     return vif
 
 
@@ -928,33 +909,23 @@ checking_vif(X_train)
 # In[85]:
 
 
-# initial list of columns
-cols = X_train.columns.tolist()
-
-# setting an initial max p-value
-max_p_value = 1
+# the same loop, with every refit warm-started from the previous coefficients on a shared
+# column-major copy of X_train (no X_train[cols] copies); one row per fit with its timing
+selection = backward_elimination(X_train, y_train, max_p_value=0.05)
+print(selection.steps)
 
-while len(cols) > 0:
-    # defining the train set
-    x_train_aux = X_train[cols]
+selected_features = selection.selected_features
+print(selected_features)
 
-    # fitting the model
-    model = sm.Logit(y_train, x_train_aux).fit(disp=False)
 
-    # getting the p-values and the maximum p-value
-    p_values = model.pvalues
-    max_p_value = max(p_values)
+# **As a check, a stepwise search (drops and adds) ranked by AIC, with every candidate model of a step fitted in parallel, warm-started from the current coefficients.**
 
-    # name of the variable with maximum p-value
-    feature_with_p_max = p_values.idxmax()
+# In[ ]:
 
-    if max_p_value > 0.05:
-        cols.remove(feature_with_p_max)
-    else:
-        break
 
-selected_features = cols
-print(selected_features)
+aic_selection = stepwise_selection(X_train, y_train, criterion="aic", n_jobs=N_JOBS)
+print(aic_selection.steps[["action", "feature", "criterion", "candidates", "seconds"]])
+print(sorted(set(aic_selection.selected_features) ^ set(selected_features)))
 
 
 # In[86]:
@@ -967,8 +938,13 @@ X_test1 = X_test[selected_features]
 # In[87]:
 
 
-logit1 = sm.Logit(y_train, X_train1.astype(float))
-lg1 = logit1.fit(disp=False)
+# "irls" or "lbfgs" fit in chunks without a float copy of the design, for large extracts
+LOGIT_BACKEND = os.environ.get("INNHOTELS_LOGIT_BACKEND", "statsmodels")
+if LOGIT_BACKEND == "statsmodels":
+    logit1 = sm.Logit(y_train, X_train1)
+    lg1 = logit1.fit(disp=False, start_params=selection.params)  # already converged there
+else:
+    lg1 = fit_logit(X_train1, y_train, method=LOGIT_BACKEND, start_params=selection.params)
 
 print(lg1.summary())
 
@@ -1253,18 +1229,70 @@ print("Testing performance comparison:")
 models_test_comp_df
 
 
+# **Exporting the final logistic regression for scoring**
+# 
+# - The coefficients, the encoded levels the model uses, the cleaning parameters and the 0.42 threshold are saved as JSON.
+# - `innhotels.scoring` scores new bookings from this file with numpy alone (`python -m innhotels.scoring logit_model.json bookings.csv`), so batch jobs don't import pandas, statsmodels or the plotting libraries.
+
+# In[ ]:
+
+
+scorer = export_logit(
+    lg1,
+    encoder,
+    DEFAULT_MODEL_PATH,
+    threshold=optimal_threshold_curve,
+    upper_whisker=Upper_Whisker,
+)
+
+# the exported model scores the raw test bookings exactly like lg1 scores the encoded test set
+raw_test = data.iloc[split.test]
+print(np.abs(scorer.predict_proba(raw_test) - lg1.predict(X_test1).to_numpy()).max())
+
+
+# **Refreshing the logistic regression with the daily booking feed**
+# 
+# - `OnlineLogit` adds a day's labelled bookings to `lg1` with one recursive IRLS step, in time proportional to the day's bookings, so the coefficients can follow the market without a full refit on the training split.
+# - Older days can be down-weighted with a decay factor; 0.99 keeps a memory of about 100 days.
+# - The test split is replayed in arrival order, and each day is scored with the coefficients from before its update, so it can be compared with the static `lg1`.
+# - `python -m innhotels update day.csv --decay 0.99` applies the same update to the exported model file.
+
+# In[ ]:
+
+
+ONLINE_DECAY = 0.99
+online_lg = OnlineLogit.from_results(lg1, decay=ONLINE_DECAY)
+
+arrival_day = (
+    raw_test["arrival_year"].to_numpy(dtype=np.int64) * 10000
+    + raw_test["arrival_month"].to_numpy(dtype=np.int64) * 100
+    + raw_test["arrival_date"].to_numpy(dtype=np.int64)
+)
+order = np.argsort(arrival_day, kind="stable")
+online_proba = np.empty(len(X_test1))
+for rows in np.split(order, np.flatnonzero(np.diff(arrival_day[order])) + 1):
+    online_proba[rows] = online_lg.predict(X_test1.iloc[rows])  # scored before the update
+    online_lg.update(X_test1.iloc[rows], y_test.iloc[rows])
+
+print("Static lg1 test AUC:", roc_auc_score(y_test, lg1.predict(X_test1)))
+print("Daily updated test AUC:", roc_auc_score(y_test, online_proba))
+online_lg.odds_table().T
+
+
 # ## Decision Tree
 
 # In[112]:
 
 
-X = data.drop(["booking_status"], axis=1)
-Y = data["booking_status"]
-
-X = pd.get_dummies(X, drop_first = True)## create dummies for X
+# the decision tree uses the shared design matrix without the constant column
+X_train, X_test = design.train(drop_constant=True), design.test(drop_constant=True)
+y_train, y_test = design.y_train, design.y_test
 
-# Splitting data in train and test sets
-X_train, X_test, y_train, y_test = train_test_split(X, Y, test_size = 0.30, random_state = 1) ## split the data into train test in the ratio 70:30 with random_state = 1
+# saving the tree's matrices as memory-mapped arrays that the tuning workers attach to without copies
+# float32 is the type the trees work in, so no worker has to convert them again
+tree_store = save_feature_store(
+    design, DEFAULT_STORE_DIR, drop_constant=True, dtype=np.float32
+)
 
 
 # #### First, let's create functions to calculate different metrics and confusion matrix so that we don't have to use the same code repeatedly for each model.
@@ -1406,8 +1434,8 @@ parameters = {
 acc_scorer = make_scorer(f1_score)
 
 # Run the grid search
-grid_obj = GridSearchCV(estimator, parameters, scoring=acc_scorer, cv=5)
-grid_obj = grid_obj.fit(X_train, y_train)
+grid_obj = GridSearchCV(estimator, parameters, scoring=acc_scorer, cv=5, n_jobs=N_JOBS)
+grid_obj = grid_obj.fit(tree_store.train(), tree_store.y_train)  # memory-mapped, not pickled
 
 # Set the clf to the best combination of parameters
 estimator = grid_obj.best_estimator_
@@ -1526,13 +1554,16 @@ plt.show()
 # In[133]:
 
 
-clfs = []
-for ccp_alpha in ccp_alphas:
-    clf = DecisionTreeClassifier(
-        random_state=1, ccp_alpha=ccp_alpha, class_weight="balanced"
-    )
-    clf.fit(X_train, y_train) ## fit decision tree on training data
-    clfs.append(clf)
+# fitting one tree per alpha in the worker processes, each attaching to the memory-mapped store
+clfs = Parallel(n_jobs=N_JOBS)(
+    delayed(fit_estimator)(
+        DecisionTreeClassifier(
+            random_state=1, ccp_alpha=ccp_alpha, class_weight="balanced"
+        ),
+        DEFAULT_STORE_DIR,
+    )  ## fit decision tree on training data
+    for ccp_alpha in ccp_alphas
+)
 print(
     "Number of nodes in the last tree is: {} with ccp_alpha: {}".format(
         clfs[-1].tree_.node_count, ccp_alphas[-1]
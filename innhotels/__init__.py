@@ -0,0 +1,3 @@
+"""
+Reusable data and modelling helpers for the INN Hotels booking cancellation project
+"""
@@ -0,0 +1,7 @@
+"""
+Entry point of python -m innhotels, see innhotels.cli
+"""
+
+from innhotels.cli import main
+
+main()
@@ -0,0 +1,193 @@
+"""
+Cleaning of the booking extract and a columnar on-disk cache of the result
+"""
+
+import hashlib
+import json
+import os
+import warnings
+
+import pandas as pd
+
+from innhotels.loader import DEFAULT_DATA_PATH, load_bookings, resolve_paths
+from innhotels.schema import apply_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # the cache is skipped without pyarrow
+    pa = None
+
+DEFAULT_CACHE_DIR = os.environ.get("INNHOTELS_CACHE", ".innhotels_cache")
+
+# bump when clean_bookings changes so stale cache files are not reused
+CACHE_VERSION = 1
+
+# parameters of the cleaning done in the notebook
+CLEANING_PARAMS = {
+    "outlier_price": 500,  # prices at or above this are assigned the upper whisker
+    "whisker_factor": 1.5,  # upper whisker = Q3 + whisker_factor * IQR
+    "children_outliers": [9, 10],  # children counts replaced by children_cap
+    "children_cap": 3,
+}
+
+
+def price_upper_whisker(prices, whisker_factor=1.5):
+    """
+    Upper whisker of the average price per room
+
+    prices: series of avg_price_per_room, or a KLLSketch of it for chunked and incremental loads
+    whisker_factor: multiple of the IQR added to the 75th quantile
+    """
+    Q1 = prices.quantile(0.25)  # 25th quantile
+    Q3 = prices.quantile(0.75)  # 75th quantile
+    return Q3 + whisker_factor * (Q3 - Q1)
+
+
+def clean_bookings(data, upper_whisker=None, **params):
+    """
+    Apply the notebook's cleaning steps to a raw booking extract
+
+    data: dataframe as returned by load_bookings (modified in place and returned)
+    upper_whisker: cap for avg_price_per_room (default None, i.e., computed from data)
+    params: overrides of CLEANING_PARAMS
+    """
+    params = {**CLEANING_PARAMS, **params}
+
+    if "Booking_ID" in data.columns:
+        data.drop(columns="Booking_ID", inplace=True)
+
+    if upper_whisker is None:
+        upper_whisker = price_upper_whisker(
+            data["avg_price_per_room"], params["whisker_factor"]
+        )
+    # assigning the outliers the value of upper whisker, in the column's own type
+    prices = data["avg_price_per_room"]
+    data.loc[prices >= params["outlier_price"], "avg_price_per_room"] = prices.dtype.type(
+        upper_whisker
+    )
+
+    # replacing the extreme children counts with the cap
+    data["no_of_children"] = data["no_of_children"].replace(
+        params["children_outliers"], params["children_cap"]
+    )
+
+    # encoding Canceled bookings to 1 and Not_Canceled as 0
+    if not pd.api.types.is_numeric_dtype(data["booking_status"]):
+        data["booking_status"] = (data["booking_status"] == "Canceled").astype("int8")
+    return data
+
+
+def file_digest(paths, block_size=1 << 20):
+    """
+    sha256 of the contents of the source files, in order
+
+    paths: list of file paths
+    block_size: number of bytes read at a time
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(paths, params):
+    """
+    Key identifying the cleaned dataset for the given sources and cleaning parameters
+
+    paths: list of source file paths
+    params: cleaning parameters
+    """
+    settings = json.dumps(
+        {"version": CACHE_VERSION, "params": params}, sort_keys=True, default=str
+    )
+    digest = hashlib.sha256(file_digest(paths).encode())
+    digest.update(settings.encode())
+    return digest.hexdigest()[:32]
+
+
+def write_cache(data, path, fmt="feather"):
+    """
+    Write a cleaned dataframe to a columnar cache file
+
+    data: cleaned dataframe
+    path: destination file
+    fmt: "feather" (Arrow IPC, can be memory-mapped) or "parquet"
+    """
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    tmp_path = path + ".tmp"
+    if fmt == "feather":
+        # uncompressed so the file can be memory-mapped on read
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+    elif fmt == "parquet":
+        pq.write_table(table, tmp_path)
+    else:
+        raise ValueError("Unknown cache format: " + str(fmt))
+    os.replace(tmp_path, path)  # never leave a half written cache behind
+
+
+def read_cache(path, fmt="feather", memory_map=False):
+    """
+    Read a cleaned dataframe back from a cache file
+
+    path: cache file
+    fmt: "feather" or "parquet"
+    memory_map: map the file instead of reading it into memory (feather only)
+    """
+    if fmt == "feather":
+        table = feather.read_table(path, memory_map=memory_map)
+    elif fmt == "parquet":
+        table = pq.read_table(path, memory_map=memory_map)
+    else:
+        raise ValueError("Unknown cache format: " + str(fmt))
+    # split_blocks lets numeric columns share the mapped buffers instead of being copied
+    return table.to_pandas(split_blocks=memory_map)
+
+
+def _load_and_clean(path, chunksize, compact, params):
+    data = load_bookings(path, chunksize=chunksize)
+    if compact:
+        data = apply_schema(data)
+    return clean_bookings(data, **params)
+
+
+def load_clean_bookings(
+    path=DEFAULT_DATA_PATH,
+    cache_dir=DEFAULT_CACHE_DIR,
+    fmt="feather",
+    memory_map=False,
+    refresh=False,
+    chunksize=None,
+    compact=True,
+    **params
+):
+    """
+    Load the cleaned booking dataset, from the cache when it is up to date
+
+    path: path or glob of the raw extract(s)
+    cache_dir: directory holding the cache files
+    fmt: "feather" (Arrow IPC) or "parquet"
+    memory_map: memory-map the cache file when reading it
+    refresh: rebuild the cache even if a matching file exists
+    chunksize: number of rows per chunk when the raw extract has to be parsed
+    compact: store the columns with the compact types of innhotels.schema
+    params: overrides of CLEANING_PARAMS
+    """
+    params = {**CLEANING_PARAMS, **params}
+    if pa is None:
+        warnings.warn("pyarrow is not installed, the cleaned dataset is not cached")
+        return _load_and_clean(path, chunksize, compact, params)
+
+    paths = resolve_paths(path)
+    key = cache_key(paths, {**params, "compact": compact})
+    cache_path = os.path.join(cache_dir, "bookings-{}.{}".format(key, fmt))
+    if os.path.exists(cache_path) and not refresh:
+        return read_cache(cache_path, fmt=fmt, memory_map=memory_map)
+
+    data = _load_and_clean(paths, chunksize, compact, params)
+    os.makedirs(cache_dir, exist_ok=True)
+    write_cache(data, cache_path, fmt=fmt)
+    return data
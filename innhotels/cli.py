@@ -0,0 +1,570 @@
+"""
+Command-line driver running the notebook's pipeline as independent stages
+
+Every stage reads and writes explicit files in a work directory, so a job runs only the
+stage it needs. After ingest, the eda, logit, tune and prune stages don't depend on each
+other and can be scheduled in parallel; evaluate uses whichever models exist.
+
+    python -m innhotels ingest --data INNHotelsGroup.csv
+    python -m innhotels eda & python -m innhotels logit & python -m innhotels prune
+    python -m innhotels evaluate
+    python -m innhotels update day.csv --decay 0.99
+    python -m innhotels score bookings.csv -o scores.csv
+
+Heavy libraries are imported inside the stages that need them.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import time
+
+DEFAULT_WORKDIR = os.environ.get("INNHOTELS_ARTIFACTS", "artifacts")
+
+# files written by the stages, relative to the work directory
+ARTIFACTS = {
+    "bookings": "bookings.feather",  # ingest: cleaned dataset
+    "ingest": "ingest.json",  # ingest: source digest, cleaning parameters and price whisker
+    "encoder": "encoder.pkl",  # ingest: fitted DummyEncoder
+    "logit_store": os.path.join("features", "logit"),  # ingest: float64 with const
+    "tree_store": os.path.join("features", "tree"),  # ingest: float32 without const
+    "eda": "eda",  # eda: report directory
+    "logit_model": "logit_model.json",  # logit: model file for innhotels.scoring
+    "logit_selection": "logit_selection.json",  # logit: backward elimination steps
+    "logit_summary": "logit_summary.txt",  # logit: statsmodels summary
+    "tree_tuned": "tree_tuned.joblib",  # tune: best pre-pruned tree
+    "tree_tuned_info": "tree_tuned.json",
+    "tree_pruned": "tree_pruned.joblib",  # prune: best post-pruned tree
+    "tree_pruned_info": "tree_pruned.json",
+    "evaluation": "evaluation.csv",  # evaluate: metrics of every model
+}
+
+# grid of the pre-pruning search in the notebook
+TREE_GRID = {
+    "max_depth": [2, 4, 6],
+    "max_leaf_nodes": [50, 75, 150, 250],
+    "min_samples_split": [10, 30, 50, 70],
+}
+
+
+def artifact(workdir, name):
+    """
+    Path of a stage artifact
+
+    workdir: work directory of the pipeline
+    name: key of ARTIFACTS
+    """
+    return os.path.join(workdir, ARTIFACTS[name])
+
+
+def _require(workdir, *names):
+    for name in names:
+        path = artifact(workdir, name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                "{} not found, run the stage that produces it first".format(path)
+            )
+
+
+def _write_json(obj, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(obj, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _read_bookings(workdir):
+    from innhotels.cache import read_cache
+
+    return read_cache(artifact(workdir, "bookings"), memory_map=True)
+
+
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be a positive integer, got " + value)
+    return number
+
+
+def _metrics(y, pred):
+    from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+
+    return {
+        "Accuracy": accuracy_score(y, pred),
+        "Recall": recall_score(y, pred),
+        "Precision": precision_score(y, pred),
+        "F1": f1_score(y, pred),
+    }
+
+
+def ingest(
+    data_path,
+    workdir=DEFAULT_WORKDIR,
+    chunksize=None,
+    test_size=0.30,
+    random_state=1,
+    derived=(),
+):
+    """
+    Load and clean the raw extract, fit the encoder, split, and save the feature stores
+
+    data_path: path or glob of the raw extract(s)
+    workdir: work directory of the pipeline
+    chunksize: number of rows per chunk when parsing (default None, i.e., whole files)
+    test_size: share of the rows in the test set
+    random_state: seed of the split
+    derived: keys of DERIVED_FEATURES added to the predictors (default none)
+    """
+    from innhotels.cache import (
+        CLEANING_PARAMS,
+        clean_bookings,
+        file_digest,
+        price_upper_whisker,
+        write_cache,
+    )
+    from innhotels.encoding import DummyEncoder
+    from innhotels.features import add_derived_features
+    from innhotels.loader import load_bookings, resolve_paths
+    from innhotels.schema import apply_schema
+    from innhotels.split import DesignMatrix, SplitIndex
+    from innhotels.store import save_feature_store
+    import numpy as np
+
+    os.makedirs(workdir, exist_ok=True)
+    paths = resolve_paths(data_path)
+    data = apply_schema(load_bookings(paths, chunksize=chunksize))
+    upper_whisker = price_upper_whisker(
+        data["avg_price_per_room"], CLEANING_PARAMS["whisker_factor"]
+    )
+    data = clean_bookings(data, upper_whisker=upper_whisker)
+    add_derived_features(data, derived)
+    write_cache(data, artifact(workdir, "bookings"))
+
+    X = data.drop(["booking_status"], axis=1)
+    encoder = DummyEncoder(drop_first=True).fit(X)
+    with open(artifact(workdir, "encoder"), "wb") as f:
+        pickle.dump(encoder, f)
+    split = SplitIndex(len(X), test_size=test_size, random_state=random_state)
+    design = DesignMatrix(encoder, X, data["booking_status"], split, add_constant=True)
+    save_feature_store(design, artifact(workdir, "logit_store"))
+    save_feature_store(
+        design, artifact(workdir, "tree_store"), drop_constant=True, dtype=np.float32
+    )
+
+    _write_json(
+        {
+            "sources": paths,
+            "digest": file_digest(paths),
+            "n_rows": len(data),
+            "cleaning": CLEANING_PARAMS,
+            "upper_whisker": float(upper_whisker),
+            "test_size": test_size,
+            "random_state": random_state,
+            "derived": list(derived),
+        },
+        artifact(workdir, "ingest"),
+    )
+    return data
+
+
+def eda(workdir=DEFAULT_WORKDIR, n_jobs=None, sample_size=None):
+    """
+    Render the EDA report of the cleaned dataset
+
+    workdir: work directory of the pipeline
+    n_jobs: number of worker processes (default None, i.e., one per core)
+    sample_size: draw the plots from a stratified sample of this many bookings
+        (default None, i.e., from all of them)
+    """
+    from innhotels.report import render_report
+
+    _require(workdir, "bookings")
+    return render_report(
+        _read_bookings(workdir),
+        artifact(workdir, "eda"),
+        n_jobs=n_jobs,
+        sample_size=sample_size,
+    )
+
+
+def fit_logit(
+    workdir=DEFAULT_WORKDIR,
+    threshold=0.42,
+    max_p_value=0.05,
+    selection="pvalue",
+    n_jobs=None,
+    backend="statsmodels",
+):
+    """
+    Select the logit predictors and export the model
+
+    workdir: work directory of the pipeline
+    threshold: probability cut-off exported with the model (default 0.42, as in the notebook)
+    max_p_value: predictors with a larger p-value are dropped (default 0.05)
+    selection: "pvalue" for the notebook's backward elimination, or "aic", "bic" or "lrt"
+        for a stepwise search scoring the candidates in parallel (default "pvalue")
+    n_jobs: worker processes of the stepwise search (default None, i.e., one per core)
+    backend: fit of the final model, "statsmodels", or "irls" or "lbfgs" reading the
+        memory-mapped store in chunks (default "statsmodels")
+    """
+    import statsmodels.api as sm
+
+    from innhotels import logit
+    from innhotels.scoring import export_logit
+    from innhotels.selection import backward_elimination, stepwise_selection
+    from innhotels.store import FeatureStore
+
+    _require(workdir, "logit_store", "encoder", "ingest")
+    store = FeatureStore(artifact(workdir, "logit_store"))
+    X_train, y_train = store.train(frame=True), store.y_train
+
+    if selection == "pvalue":
+        # dropping the predictor with the highest p-value until all are significant
+        result = backward_elimination(X_train, y_train, max_p_value=max_p_value)
+    else:
+        result = stepwise_selection(
+            X_train, y_train, criterion=selection, alpha_out=max_p_value, n_jobs=n_jobs
+        )
+    cols = result.selected_features
+    if backend == "statsmodels":
+        model = sm.Logit(y_train, X_train[cols])
+        model = model.fit(disp=False, start_params=result.params)
+    else:
+        model = logit.fit_logit(
+            store.train(),
+            y_train,
+            columns=cols,
+            names=store.feature_names,
+            method=backend,
+            start_params=result.params,
+        )
+
+    with open(artifact(workdir, "encoder"), "rb") as f:
+        encoder = pickle.load(f)
+    ingest_info = _read_json(artifact(workdir, "ingest"))
+    export_logit(
+        model,
+        encoder,
+        artifact(workdir, "logit_model"),
+        threshold=threshold,
+        upper_whisker=ingest_info["upper_whisker"],
+        params=ingest_info["cleaning"],
+    )
+    _write_json(
+        {
+            "selected_features": cols,
+            "selection": selection,
+            "steps": json.loads(result.steps.to_json(orient="records")),
+            "threshold": threshold,
+        },
+        artifact(workdir, "logit_selection"),
+    )
+    with open(artifact(workdir, "logit_summary"), "w") as f:
+        f.write(str(model.summary()))
+    return model
+
+
+def tune_tree(workdir=DEFAULT_WORKDIR, n_jobs=-1, cv=5):
+    """
+    Grid search of the pre-pruning parameters of the decision tree
+
+    workdir: work directory of the pipeline
+    n_jobs: number of worker processes (default -1, i.e., one per core)
+    cv: number of cross-validation folds
+    """
+    import joblib
+    from sklearn.metrics import f1_score, make_scorer
+    from sklearn.model_selection import GridSearchCV
+    from sklearn.tree import DecisionTreeClassifier
+
+    from innhotels.store import FeatureStore
+
+    _require(workdir, "tree_store")
+    store = FeatureStore(artifact(workdir, "tree_store"))
+    estimator = DecisionTreeClassifier(random_state=1, class_weight="balanced")
+    grid_obj = GridSearchCV(
+        estimator, TREE_GRID, scoring=make_scorer(f1_score), cv=cv, n_jobs=n_jobs
+    )
+    grid_obj.fit(store.train(frame=True), store.y_train)
+
+    joblib.dump(grid_obj.best_estimator_, artifact(workdir, "tree_tuned"))
+    _write_json(
+        {"best_params": grid_obj.best_params_, "best_score": grid_obj.best_score_},
+        artifact(workdir, "tree_tuned_info"),
+    )
+    return grid_obj.best_estimator_
+
+
+def prune_tree(workdir=DEFAULT_WORKDIR, n_jobs=-1):
+    """
+    Cost complexity pruning search, keeping the tree with the best test F1
+
+    workdir: work directory of the pipeline
+    n_jobs: number of worker processes (default -1, i.e., one per core)
+    """
+    import joblib
+    import numpy as np
+    from joblib import Parallel, delayed
+    from sklearn.metrics import f1_score
+    from sklearn.tree import DecisionTreeClassifier
+
+    from innhotels.store import FeatureStore, fit_estimator
+
+    _require(workdir, "tree_store")
+    store_dir = artifact(workdir, "tree_store")
+    store = FeatureStore(store_dir)
+    X_train, X_test = store.train(frame=True), store.test(frame=True)
+
+    clf = DecisionTreeClassifier(random_state=1, class_weight="balanced")
+    ccp_alphas = abs(clf.cost_complexity_pruning_path(X_train, store.y_train).ccp_alphas)
+    # the last alpha prunes the whole tree, leaving a single node
+    ccp_alphas = ccp_alphas[:-1]
+    clfs = Parallel(n_jobs=n_jobs)(
+        delayed(fit_estimator)(
+            DecisionTreeClassifier(
+                random_state=1, ccp_alpha=ccp_alpha, class_weight="balanced"
+            ),
+            store_dir,
+        )
+        for ccp_alpha in ccp_alphas
+    )
+    f1_train = [f1_score(store.y_train, clf.predict(X_train)) for clf in clfs]
+    f1_test = [f1_score(store.y_test, clf.predict(X_test)) for clf in clfs]
+    index_best_model = int(np.argmax(f1_test))
+
+    joblib.dump(clfs[index_best_model], artifact(workdir, "tree_pruned"))
+    _write_json(
+        {
+            "ccp_alpha": ccp_alphas[index_best_model],
+            "ccp_alphas": list(ccp_alphas),
+            "f1_train": f1_train,
+            "f1_test": f1_test,
+        },
+        artifact(workdir, "tree_pruned_info"),
+    )
+    return clfs[index_best_model]
+
+
+def evaluate(workdir=DEFAULT_WORKDIR):
+    """
+    Metrics on the train and test sets of every model produced so far
+
+    workdir: work directory of the pipeline
+    """
+    import joblib
+    import numpy as np
+    import pandas as pd
+
+    from innhotels.scoring import LogitScorer
+    from innhotels.store import FeatureStore
+
+    rows = []
+    if os.path.exists(artifact(workdir, "logit_model")):
+        _require(workdir, "logit_store")
+        scorer = LogitScorer.load(artifact(workdir, "logit_model"))
+        store = FeatureStore(artifact(workdir, "logit_store"))
+        for part in ("train", "test"):
+            X = store.get(part, frame=True)[scorer.feature_names].to_numpy()
+            proba = 1.0 / (1.0 + np.exp(-(X @ scorer.coefficients)))
+            y = store.y_train if part == "train" else store.y_test
+            name = "Logistic Regression-{} Threshold".format(scorer.threshold)
+            rows.append({"model": name, "part": part, **_metrics(y, proba > scorer.threshold)})
+
+    trees = (
+        ("tree_tuned", "Decision Tree (Pre-Pruning)"),
+        ("tree_pruned", "Decision Tree (Post-Pruning)"),
+    )
+    for key, name in trees:
+        if not os.path.exists(artifact(workdir, key)):
+            continue
+        _require(workdir, "tree_store")
+        model = joblib.load(artifact(workdir, key))
+        store = FeatureStore(artifact(workdir, "tree_store"))
+        for part in ("train", "test"):
+            y = store.y_train if part == "train" else store.y_test
+            pred = model.predict(store.get(part, frame=True))
+            rows.append({"model": name, "part": part, **_metrics(y, pred)})
+
+    if not rows:
+        raise FileNotFoundError(
+            "No model found in {}, run logit, tune or prune first".format(workdir)
+        )
+    results = pd.DataFrame(rows)
+    results.to_csv(artifact(workdir, "evaluation"), index=False)
+    return results
+
+
+def update_logit(bookings, workdir=DEFAULT_WORKDIR, model_path=None, decay=1.0, steps=1):
+    """
+    Refresh the exported logit coefficients with a csv of new labelled bookings
+
+    One recursive IRLS update from the coefficients and information matrix saved in the
+    model file, so a day's bookings are added without refitting on the training split.
+
+    bookings: csv file of bookings with their booking_status
+    workdir: work directory of the pipeline
+    model_path: model file, updated in place (default None, i.e., the logit stage's)
+    decay: weight kept by the data already in the model, in (0, 1] (default 1)
+    steps: Newton steps on the batch, at least 1 (default 1)
+    """
+    import numpy as np
+
+    from innhotels.logit import OnlineLogit
+    from innhotels.scoring import LogitScorer, read_records, save_spec
+
+    model_path = model_path or artifact(workdir, "logit_model")
+    scorer = LogitScorer.load(model_path)
+    spec = scorer.spec
+    if "information" not in spec:
+        raise ValueError(
+            model_path + " has no information matrix, export it again to update it"
+        )
+    data = read_records(bookings)
+    # the raw extract has Canceled / Not_Canceled, the cleaned one 1 / 0
+    y = np.isin(data["booking_status"], ["Canceled", "1"])
+    online = OnlineLogit(
+        scorer.feature_names,
+        scorer.coefficients,
+        spec["information"],
+        spec.get("nobs", 0),
+        decay,
+    )
+    online.update(scorer.transform(data), y, steps=steps)
+    spec = {
+        **spec,
+        "coefficients": [float(value) for value in online.params.to_numpy()],
+        "information": online.information.tolist(),
+        "nobs": float(online.nobs),
+        "updates": spec.get("updates", 0) + 1,
+    }
+    save_spec(spec, model_path)
+    return online
+
+
+def score(bookings, workdir=DEFAULT_WORKDIR, model_path=None, output=None, threshold=None):
+    """
+    Score a csv of raw bookings with the exported logit model
+
+    bookings: csv file of bookings
+    workdir: work directory of the pipeline
+    model_path: model file (default None, i.e., the logit stage's model in workdir)
+    output: output csv file (default None, i.e., standard output)
+    threshold: probability cut-off (default None, i.e., the exported threshold)
+    """
+    from innhotels.scoring import score_file
+
+    model_path = model_path or artifact(workdir, "logit_model")
+    if output is None:
+        return score_file(model_path, bookings, threshold=threshold)
+    with open(output, "w", newline="") as out:
+        return score_file(model_path, bookings, out, threshold=threshold)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m innhotels", description="INN Hotels booking cancellation pipeline"
+    )
+    parser.add_argument(
+        "--workdir", default=DEFAULT_WORKDIR, help="directory of the stage artifacts"
+    )
+    stages = parser.add_subparsers(dest="stage", required=True)
+
+    p = stages.add_parser("ingest", help="clean, encode and split the raw extract")
+    p.add_argument("--data", help="path or glob of the raw extract(s)")
+    p.add_argument("--chunksize", type=int, help="rows per chunk when parsing")
+    p.add_argument("--test-size", type=float, default=0.30)
+    p.add_argument("--random-state", type=int, default=1)
+    p.add_argument(
+        "--derived", nargs="*", default=[], help="derived features added to the predictors"
+    )
+
+    p = stages.add_parser("eda", help="render the EDA report")
+    p.add_argument("--n-jobs", type=int, help="worker processes (default one per core)")
+    p.add_argument("--sample-size", type=int, help="plot from a stratified sample")
+
+    p = stages.add_parser("logit", help="fit the logit model and select its predictors")
+    p.add_argument("--threshold", type=float, default=0.42)
+    p.add_argument("--max-p-value", type=float, default=0.05)
+    p.add_argument(
+        "--selection", choices=["pvalue", "aic", "bic", "lrt"], default="pvalue"
+    )
+    p.add_argument("--n-jobs", type=int, help="worker processes of the stepwise search")
+    p.add_argument(
+        "--backend", choices=["statsmodels", "irls", "lbfgs"], default="statsmodels"
+    )
+
+    p = stages.add_parser("tune", help="grid search of the pre-pruned decision tree")
+    p.add_argument("--n-jobs", type=int, default=-1)
+    p.add_argument("--cv", type=int, default=5)
+
+    p = stages.add_parser("prune", help="cost complexity pruning search of the decision tree")
+    p.add_argument("--n-jobs", type=int, default=-1)
+
+    stages.add_parser("evaluate", help="train and test metrics of every model")
+
+    p = stages.add_parser("update", help="update the logit model with new bookings")
+    p.add_argument("bookings", help="csv file of labelled bookings")
+    p.add_argument("--model", help="model file (default the logit stage's)")
+    p.add_argument("--decay", type=float, default=1.0, help="weight kept by older data")
+    p.add_argument(
+        "--steps", type=_positive_int, default=1, help="Newton steps on the batch"
+    )
+
+    p = stages.add_parser("score", help="score a csv of bookings with the logit model")
+    p.add_argument("bookings", help="csv file of bookings")
+    p.add_argument("--model", help="model file (default the logit stage's)")
+    p.add_argument("-o", "--output", help="output csv file (default standard output)")
+    p.add_argument("--threshold", type=float, help="override the exported threshold")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    workdir = args.workdir
+    start = time.perf_counter()
+
+    if args.stage == "ingest":
+        from innhotels.loader import DEFAULT_DATA_PATH
+
+        ingest(
+            args.data or DEFAULT_DATA_PATH,
+            workdir,
+            args.chunksize,
+            args.test_size,
+            args.random_state,
+            args.derived,
+        )
+    elif args.stage == "eda":
+        eda(workdir, args.n_jobs, args.sample_size)
+    elif args.stage == "logit":
+        fit_logit(
+            workdir,
+            args.threshold,
+            args.max_p_value,
+            args.selection,
+            args.n_jobs,
+            args.backend,
+        )
+    elif args.stage == "tune":
+        tune_tree(workdir, args.n_jobs, args.cv)
+    elif args.stage == "prune":
+        prune_tree(workdir, args.n_jobs)
+    elif args.stage == "evaluate":
+        print(evaluate(workdir).to_string(index=False))
+    elif args.stage == "update":
+        update_logit(args.bookings, workdir, args.model, args.decay, args.steps)
+    elif args.stage == "score":
+        score(args.bookings, workdir, args.model, args.output, args.threshold)
+        return  # standard output may hold the scores
+
+    print("{} done in {:.1f}s".format(args.stage, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
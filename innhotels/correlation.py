@@ -0,0 +1,95 @@
+"""
+Streaming, mergeable covariance and Pearson correlation of the numeric columns
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class CovarianceAccumulator:
+    """
+    Running count, means and co-moment matrix of a set of columns
+
+    Each chunk is reduced to its own count, means and centred co-moments, which are
+    combined with the running totals by the pairwise update of Chan et al. (the
+    batched form of Welford's algorithm), so the result does not depend on how the
+    rows are split into chunks or partitions and no chunk is kept. Rows with a missing
+    value in any of the columns are skipped.
+
+    columns: names of the numeric columns
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.n = 0
+        self.mean = np.zeros(p)
+        self.comoment = np.zeros((p, p))
+
+    def _combine(self, n, mean, comoment):
+        if n == 0:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.comoment += comoment + np.outer(delta, delta) * (self.n * n / total)
+        self.mean += delta * (n / total)
+        self.n = total
+
+    def update(self, chunk):
+        """
+        Add a chunk of rows
+
+        chunk: dataframe with the columns
+        """
+        X = chunk[self.columns].to_numpy(dtype=np.float64)
+        X = X[~np.isnan(X).any(axis=1)]
+        if len(X):
+            mean = X.mean(axis=0)
+            centred = X - mean
+            self._combine(len(X), mean, centred.T @ centred)
+        return self
+
+    def merge(self, other):
+        """
+        Merge the accumulator of other rows into this one
+
+        other: CovarianceAccumulator over the same columns
+        """
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge accumulators over different columns")
+        self._combine(other.n, other.mean, other.comoment)
+        return self
+
+    def cov(self, ddof=1):
+        """
+        Covariance matrix, as data[columns].cov()
+
+        ddof: delta degrees of freedom (default 1)
+        """
+        cov = self.comoment / (self.n - ddof) if self.n > ddof else np.full_like(self.comoment, np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def corr(self):
+        """
+        Pearson correlation matrix, as data[columns].corr()
+        """
+        cov = self.cov().to_numpy()
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.outer(std, std)
+        corr = np.clip(corr, -1, 1)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+def correlation_from_chunks(chunks, columns):
+    """
+    Pearson correlation matrix of columns computed in one pass over chunks
+
+    chunks: iterable of dataframes, e.g. iter_booking_chunks(path)
+    columns: names of the numeric columns
+    """
+    accumulator = CovarianceAccumulator(columns)
+    for chunk in chunks:
+        accumulator.update(chunk)
+    return accumulator.corr()
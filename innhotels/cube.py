@@ -0,0 +1,146 @@
+"""
+Count cube of every categorical and low-cardinality column against the target
+"""
+
+import numpy as np
+import pandas as pd
+
+# columns with more distinct values than this are left out of the cube, unless categorical
+MAX_LEVELS = 50
+
+
+def normalize_crosstab(tab, margins=False, normalize=False):
+    """
+    Shares and totals of a table of counts, as pd.crosstab's normalize and margins
+
+    tab: counts, one row per level and one column per target class
+    margins: add "All" row and column totals (default False)
+    normalize: False, "index", "columns" or "all" (default False)
+    """
+    if normalize == "index":
+        tab = tab.div(tab.sum(axis=1), axis=0)
+    elif normalize == "columns":
+        tab = tab.div(tab.sum(axis=0), axis=1)
+    elif normalize == "all":
+        tab = tab / tab.to_numpy().sum()
+    if margins:
+        tab["All"] = tab.sum(axis=1)
+        tab.loc["All"] = tab.sum(axis=0)
+    return tab
+
+
+class CountCube:
+    """
+    Counts of each level of every low-cardinality column per target class
+
+    A chunk is added with one factorisation per column and a single bincount over
+    all the columns at once, and chunks (or cubes of other partitions) can be merged.
+    The tables stacked_barplot prints and plots are then read from the cube instead of
+    two pd.crosstab scans per predictor.
+
+    target: name of the target column (default "booking_status")
+    columns: columns to count (default None, i.e., every column of categorical dtype
+        and the other columns, numeric or text, with at most max_levels distinct
+        values, so identifiers such as Booking_ID are left out)
+    max_levels: cardinality limit of the columns that are not of categorical dtype
+        (default MAX_LEVELS), None counts every column whatever its cardinality
+    """
+
+    def __init__(self, target="booking_status", columns=None, max_levels=MAX_LEVELS):
+        self.target = target
+        self.columns = None if columns is None else list(columns)
+        self.max_levels = max_levels
+        self.tables = {}
+
+    @classmethod
+    def from_frame(cls, data, target="booking_status", columns=None, max_levels=MAX_LEVELS):
+        """
+        Build a cube from an in-memory dataframe
+
+        data: dataframe with the target column
+        target: name of the target column (default "booking_status")
+        columns: columns to count (default None, i.e., chosen automatically)
+        max_levels: cardinality limit of the numeric columns (default MAX_LEVELS)
+        """
+        return cls(target, columns, max_levels).update(data)
+
+    def update(self, chunk):
+        """
+        Add the counts of a chunk of bookings
+
+        chunk: dataframe with the target column
+        """
+        target_codes, classes = pd.factorize(chunk[self.target], sort=True)
+        n_classes = len(classes)
+
+        factorized = {}
+        candidates = self.columns or [col for col in chunk.columns if col != self.target]
+        for col in candidates:
+            series = chunk[col]
+            codes, levels = pd.factorize(series, sort=True)
+            if (
+                self.columns is None
+                and self.max_levels is not None
+                and not isinstance(series.dtype, pd.CategoricalDtype)
+                and len(levels) > self.max_levels
+            ):
+                continue
+            factorized[col] = (codes, levels)
+        if self.columns is None:
+            self.columns = list(factorized)
+
+        # one bincount over all the columns: every column gets its own block of cells
+        flat, offsets, offset = [], {}, 0
+        for col, (codes, levels) in factorized.items():
+            valid = (codes >= 0) & (target_codes >= 0)  # missing values are not counted
+            flat.append(offset + codes[valid] * n_classes + target_codes[valid])
+            offsets[col] = offset
+            offset += len(levels) * n_classes
+        cells = np.bincount(np.concatenate(flat), minlength=offset) if flat else np.zeros(0)
+
+        for col, (codes, levels) in factorized.items():
+            block = cells[offsets[col]: offsets[col] + len(levels) * n_classes]
+            table = pd.DataFrame(
+                block.reshape(len(levels), n_classes),
+                index=pd.Index(np.asarray(levels), name=col),
+                columns=pd.Index(np.asarray(classes), name=self.target),
+            )
+            self._add(col, table)
+        return self
+
+    def _add(self, col, table):
+        if col in self.tables:
+            table = self.tables[col].add(table, fill_value=0).fillna(0).astype(np.int64)
+            table = table.sort_index().reindex(sorted(table.columns), axis=1)
+        self.tables[col] = table
+
+    def merge(self, other):
+        """
+        Merge the counts of another cube into this one
+
+        other: CountCube of other rows with the same target
+        """
+        for col, table in other.tables.items():
+            self._add(col, table)
+        if self.columns is None:
+            self.columns = other.columns
+        return self
+
+    def __contains__(self, col):
+        return col in self.tables
+
+    def class_counts(self):
+        """
+        Number of rows of each target class
+        """
+        return next(iter(self.tables.values())).sum(axis=0)
+
+    def crosstab(self, col, margins=False, normalize=False):
+        """
+        Same as pd.crosstab(data[col], data[target], margins=margins, normalize=normalize)
+
+        col: column name
+        margins: add "All" row and column totals (default False)
+        normalize: False, "index", "columns" or "all" (default False)
+        """
+        return normalize_crosstab(self.tables[col].copy(), margins, normalize)
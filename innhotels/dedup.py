@@ -0,0 +1,133 @@
+"""
+Persistent row-hash index for detecting duplicate bookings across feed files
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from innhotels.cache import DEFAULT_CACHE_DIR
+
+DEFAULT_INDEX_PATH = os.path.join(DEFAULT_CACHE_DIR, "row_hashes.npy")
+
+
+def row_hashes(chunk, columns=None, float_decimals=4):
+    """
+    64-bit hash of every row of a chunk
+
+    Values are normalised first (integers to int64, floats rounded to float_decimals),
+    so the same booking hashes the same whether it was read raw or compacted.
+
+    chunk: dataframe of raw bookings, including Booking_ID
+    columns: columns to hash (default None, i.e., all of them)
+    float_decimals: decimals kept from float columns (default 4)
+    """
+    chunk = chunk if columns is None else chunk[list(columns)]
+    normalised = {}
+    for col in chunk.columns:
+        values = chunk[col]
+        if pd.api.types.is_integer_dtype(values):
+            values = values.astype(np.int64)
+        elif pd.api.types.is_float_dtype(values):
+            values = values.astype(np.float64).round(float_decimals)
+        normalised[col] = values
+    frame = pd.DataFrame(normalised, index=chunk.index)
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+class RowHashIndex:
+    """
+    Sorted array of the hashes of every booking row seen so far
+
+    Checking a chunk is a binary search of its hashes (O(b log n) for b new rows and
+    n rows of history) rather than a rescan of the history. Rows are identified by a
+    64-bit hash of all raw columns including Booking_ID, so replays of the same booking
+    in another feed file are caught; the chance of two different rows colliding is
+    about n**2 / 2**65.
+
+    hashes: hashes already seen (default None, i.e., an empty index)
+    columns: columns to hash (default None, i.e., all of them)
+    """
+
+    def __init__(self, hashes=None, columns=None):
+        self.hashes = np.unique(
+            np.asarray(hashes if hashes is not None else [], dtype=np.uint64)
+        )
+        self.columns = columns
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH, columns=None):
+        """
+        Load a persisted index, or start an empty one if there is none
+
+        path: .npy file of the index
+        columns: columns to hash (default None, i.e., all of them)
+        """
+        hashes = np.load(path) if os.path.exists(path) else None
+        return cls(hashes, columns=columns)
+
+    def save(self, path=DEFAULT_INDEX_PATH):
+        """
+        Persist the index, replacing the file atomically
+
+        path: .npy file of the index
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, self.hashes)
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def contains(self, hashes):
+        """
+        Whether each hash is already in the index
+
+        hashes: array of row hashes
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if len(self.hashes) == 0:
+            return np.zeros(len(hashes), dtype=bool)
+        positions = np.searchsorted(self.hashes, hashes)
+        found = self.hashes[np.minimum(positions, len(self.hashes) - 1)]
+        return found == hashes
+
+    def check(self, chunk):
+        """
+        Flag the rows of a chunk that were seen before, in the index or earlier in the chunk
+
+        chunk: dataframe of raw bookings
+        """
+        hashes = row_hashes(chunk, self.columns)
+        seen = self.contains(hashes) | pd.Series(hashes).duplicated().to_numpy()
+        return pd.Series(seen, index=chunk.index)
+
+    def add(self, chunk):
+        """
+        Flag the duplicate rows of a chunk and add the new ones to the index
+
+        chunk: dataframe of raw bookings
+        """
+        hashes = row_hashes(chunk, self.columns)
+        seen = self.contains(hashes)
+        new = np.unique(hashes[~seen])
+        duplicated = seen | pd.Series(hashes).duplicated().to_numpy()
+        # inserting the sorted new hashes keeps the index sorted without re-sorting it
+        self.hashes = np.insert(self.hashes, np.searchsorted(self.hashes, new), new)
+        return pd.Series(duplicated, index=chunk.index)
+
+    def deduplicate(self, chunks, drop=True):
+        """
+        Stream chunks through the index as they arrive
+
+        chunks: iterable of dataframes of raw bookings, e.g. iter_booking_chunks(path)
+        drop: drop the duplicate rows, otherwise add a boolean "is_duplicate" column (default True)
+        """
+        for chunk in chunks:
+            duplicated = self.add(chunk)
+            if drop:
+                yield chunk[~duplicated.to_numpy()]
+            else:
+                yield chunk.assign(is_duplicate=duplicated.to_numpy())
@@ -0,0 +1,170 @@
+"""
+One-hot encoding of the booking predictors with levels learnt once
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _is_categorical(series):
+    return (
+        isinstance(series.dtype, pd.CategoricalDtype)
+        or pd.api.types.is_object_dtype(series)
+        or pd.api.types.is_string_dtype(series)
+    )
+
+
+class DummyEncoder:
+    """
+    Fitted replacement for pd.get_dummies
+
+    Learns the levels of every categorical column once, so training data and new
+    bookings are always encoded to the same columns in the same order. The column
+    names and order match pd.get_dummies (and sm.add_constant when a constant is added).
+
+    drop_first: drop the first level of every categorical column (default True)
+    dtype: type of the dummy columns (default uint8)
+    """
+
+    def __init__(self, drop_first=True, dtype=np.uint8):
+        self.drop_first = drop_first
+        self.dtype = dtype
+
+    def fit(self, data):
+        """
+        Learn the numeric columns and the levels of the categorical columns
+
+        data: dataframe of predictors
+        """
+        self.columns_ = list(data.columns)
+        self.numeric_columns_ = []
+        self.levels_ = {}
+        for col in self.columns_:
+            series = data[col]
+            if not _is_categorical(series):
+                self.numeric_columns_.append(col)
+            elif isinstance(series.dtype, pd.CategoricalDtype):
+                self.levels_[col] = list(series.cat.categories)
+            else:
+                self.levels_[col] = sorted(series.dropna().unique())
+
+        self.dummy_columns_ = []
+        for col, levels in self.levels_.items():
+            kept = levels[1:] if self.drop_first else levels
+            self.dummy_columns_.extend("{}_{}".format(col, level) for level in kept)
+        self.feature_names_ = self.numeric_columns_ + self.dummy_columns_
+        return self
+
+    def fit_transform(self, data, add_constant=False, sparse=False):
+        """
+        Fit the encoder and encode data
+
+        data: dataframe of predictors
+        add_constant: prepend a "const" column of ones (default False)
+        sparse: return a scipy CSR matrix instead of a dataframe (default False)
+        """
+        return self.fit(data).transform(data, add_constant=add_constant, sparse=sparse)
+
+    def get_feature_names(self, add_constant=False):
+        """
+        Names of the encoded columns, in output order
+
+        add_constant: include the "const" column (default False)
+        """
+        return (["const"] if add_constant else []) + self.feature_names_
+
+    def _dummy_codes(self, data):
+        """
+        Output column of every row for each categorical column, -1 when no dummy is set
+        """
+        offset = 0
+        for col, levels in self.levels_.items():
+            # levels unseen during fit get code -1, i.e., all dummies of the column are 0
+            codes = pd.Categorical(data[col], categories=levels).codes.astype(np.int64)
+            n_kept = len(levels)
+            if self.drop_first:
+                codes = codes - 1
+                n_kept -= 1
+            yield np.where(codes >= 0, codes + offset, -1)
+            offset += n_kept
+
+    def transform(self, data, add_constant=False, sparse=False):
+        """
+        Encode predictors with the learnt levels
+
+        data: dataframe with the columns seen during fit
+        add_constant: prepend a "const" column of ones (default False)
+        sparse: return a scipy CSR matrix instead of a dataframe (default False)
+        """
+        missing = [col for col in self.columns_ if col not in data.columns]
+        if missing:
+            raise KeyError("Columns missing from the data: " + ", ".join(missing))
+
+        n_rows = len(data)
+        if sparse:
+            return self._transform_sparse(data, add_constant)
+
+        dummies = np.zeros((n_rows, len(self.dummy_columns_)), dtype=self.dtype)
+        rows = np.arange(n_rows)
+        for codes in self._dummy_codes(data):
+            hit = codes >= 0
+            dummies[rows[hit], codes[hit]] = 1
+
+        parts = [data[self.numeric_columns_]]
+        if add_constant:
+            parts.insert(0, pd.DataFrame({"const": 1.0}, index=data.index))
+        parts.append(pd.DataFrame(dummies, index=data.index, columns=self.dummy_columns_))
+        return pd.concat(parts, axis=1)
+
+    def transform_array(self, data, add_constant=False, rows=None, dtype=np.float64):
+        """
+        Encode predictors straight into one contiguous column-major array
+
+        data: dataframe with the columns seen during fit
+        add_constant: prepend a column of ones (default False)
+        rows: positions of the rows to output, in order (default None, i.e., all rows)
+        dtype: type of the array (default float64)
+        """
+        n_rows = len(data) if rows is None else len(rows)
+        offset = 1 if add_constant else 0
+        n_numeric = len(self.numeric_columns_)
+        # column-major so that column slices and single columns are contiguous
+        out = np.zeros(
+            (n_rows, offset + n_numeric + len(self.dummy_columns_)), dtype=dtype, order="F"
+        )
+        if add_constant:
+            out[:, 0] = 1
+        for j, col in enumerate(self.numeric_columns_):
+            values = data[col].to_numpy()
+            out[:, offset + j] = values if rows is None else values[rows]
+
+        positions = np.arange(n_rows)
+        for codes in self._dummy_codes(data):
+            codes = codes if rows is None else codes[rows]
+            hit = codes >= 0
+            out[positions[hit], offset + n_numeric + codes[hit]] = 1
+        return out
+
+    def _transform_sparse(self, data, add_constant):
+        from scipy import sparse as sp
+
+        n_rows = len(data)
+        blocks = []
+        if add_constant:
+            blocks.append(sp.csr_matrix(np.ones((n_rows, 1))))
+        blocks.append(sp.csr_matrix(data[self.numeric_columns_].to_numpy(dtype=float)))
+
+        rows, cols = [], []
+        for codes in self._dummy_codes(data):
+            hit = np.flatnonzero(codes >= 0)
+            rows.append(hit)
+            cols.append(codes[hit])
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+        blocks.append(
+            sp.csr_matrix(
+                (np.ones(len(rows)), (rows, cols)),
+                shape=(n_rows, len(self.dummy_columns_)),
+            )
+        )
+        return sp.hstack(blocks, format="csr")
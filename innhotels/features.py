@@ -0,0 +1,87 @@
+"""
+Derived booking features computed as columns of the main frame, and the EDA subsets as masks
+"""
+
+import numpy as np
+import pandas as pd
+
+from innhotels.schema import compact_dtype
+
+# derived columns and the columns they are the sum of
+DERIVED_FEATURES = {
+    "no_of_family_members": ["no_of_adults", "no_of_children"],
+    "total_days": ["no_of_week_nights", "no_of_weekend_nights"],
+    "total_previous_bookings": [
+        "no_of_previous_cancellations",
+        "no_of_previous_bookings_not_canceled",
+    ],
+}
+
+# subsets of the bookings studied in the EDA, as row filters
+SUBSETS = {
+    # guests traveling with their families
+    "family": lambda data: (data["no_of_children"] >= 0) & (data["no_of_adults"] > 1),
+    # guests staying both week and weekend nights
+    "stay": lambda data: (
+        (data["no_of_week_nights"] > 0) & (data["no_of_weekend_nights"] > 0)
+    ),
+}
+
+
+def derived_feature(data, name):
+    """
+    Values of a derived feature, without adding it to the frame
+
+    The sum is taken in int64, so compact uint8 sources don't wrap around, and cast
+    back to the smallest type that holds the result.
+
+    data: dataframe with the source columns
+    name: key of DERIVED_FEATURES
+    """
+    total = np.zeros(len(data), dtype=np.int64)
+    for col in DERIVED_FEATURES[name]:
+        total += data[col].to_numpy(dtype=np.int64)
+    return compact_dtype(pd.Series(total, index=data.index, name=name))
+
+
+def add_derived_features(data, names=None):
+    """
+    Add derived features as columns of the frame, in place
+
+    The features are exact sums of other predictors, so a linear model given both a
+    feature and all of its sources is singular; drop one of them before fitting.
+
+    data: dataframe of bookings (modified in place and returned)
+    names: features to add (default None, i.e., every key of DERIVED_FEATURES)
+    """
+    for name in DERIVED_FEATURES if names is None else names:
+        data[name] = derived_feature(data, name)
+    return data
+
+
+def subset_mask(data, name):
+    """
+    Boolean mask of the rows of an EDA subset, e.g. "family" or "stay"
+
+    data: dataframe of bookings
+    name: key of SUBSETS
+    """
+    return SUBSETS[name](data).to_numpy()
+
+
+def subset_columns(data, name, columns):
+    """
+    Rows of an EDA subset restricted to a few columns, derived features included
+
+    Only the requested columns of the subset are copied, never the whole frame.
+
+    data: dataframe of bookings
+    name: key of SUBSETS
+    columns: columns to return, raw or keys of DERIVED_FEATURES
+    """
+    mask = subset_mask(data, name)
+    out = {}
+    for col in columns:
+        values = data[col] if col in data.columns else derived_feature(data, col)
+        out[col] = values[mask]
+    return pd.DataFrame(out)
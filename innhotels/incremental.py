@@ -0,0 +1,181 @@
+"""
+Persisted EDA aggregates updated incrementally from the daily booking feed
+"""
+
+import os
+import pickle
+
+import pandas as pd
+
+from innhotels.cache import DEFAULT_CACHE_DIR, file_digest, price_upper_whisker
+from innhotels.loader import iter_booking_chunks, resolve_paths
+from innhotels.sketch import KLLSketch
+from innhotels.summary import BookingSummary
+
+DEFAULT_STATE_PATH = os.path.join(DEFAULT_CACHE_DIR, "aggregates.pkl")
+
+# bumped when the layout of the pickled state changes, older states are rebuilt
+STATE_VERSION = 3
+
+
+class AggregateState:
+    """
+    BookingSummary of the whole booking history, kept on disk between runs
+
+    Appending a batch only touches the batch rows and the (small) per-value counts,
+    so refreshing the EDA tables costs time proportional to the batch, not the history.
+
+    target: name of the target column (default "booking_status")
+    """
+
+    def __init__(self, target="booking_status", sketch_k=400):
+        self.summary = BookingSummary(target=target)
+        self.price_sketch = KLLSketch(k=sketch_k)  # for the outlier capping threshold
+        self.batches = []  # ids of the batches already applied
+        # content digest of every feed file seen, by (absolute path, size, mtime_ns)
+        self.manifest = {}
+        self.version = STATE_VERSION
+
+    @classmethod
+    def load(cls, path=DEFAULT_STATE_PATH, target="booking_status"):
+        """
+        Load the persisted state, or start an empty one if there is none
+
+        A state saved with another layout is discarded, so every feed file is applied
+        again.
+
+        path: state file
+        target: name of the target column of a new state
+        """
+        if not os.path.exists(path):
+            return cls(target=target)
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        version = getattr(state, "version", 1)
+        if version == 2:
+            # same aggregates, only the manifest is new: the files are hashed once more
+            state.manifest, state.version = {}, STATE_VERSION
+        elif version != STATE_VERSION:
+            return cls(target=target)
+        return state
+
+    def save(self, path=DEFAULT_STATE_PATH):
+        """
+        Persist the state, replacing the file atomically
+
+        path: state file
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def append(self, batch, batch_id=None):
+        """
+        Add a batch of bookings to the aggregates
+
+        batch: dataframe or iterable of dataframe chunks
+        batch_id: identifier of the batch, a batch already applied is skipped (default None)
+        """
+        if batch_id is not None and batch_id in self.batches:
+            return False
+        chunks = [batch] if isinstance(batch, pd.DataFrame) else batch
+        for chunk in chunks:
+            self.summary.update(chunk)
+            self.price_sketch.update(chunk["avg_price_per_room"].to_numpy())
+        if batch_id is not None:
+            self.batches.append(batch_id)
+        return True
+
+    def _file_digest(self, file):
+        """
+        Content digest of a feed file, hashed only when the file is new or changed
+        """
+        stat = os.stat(file)
+        path = os.path.abspath(file)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        if key not in self.manifest:
+            # a rewritten file replaces its old entry
+            for old in [old for old in self.manifest if old[0] == path]:
+                del self.manifest[old]
+            self.manifest[key] = file_digest([file])
+        return self.manifest[key]
+
+    def append_files(self, path, chunksize=500_000):
+        """
+        Add every feed file not applied yet, identified by the hash of its contents
+
+        Files whose path, size and modification time are unchanged since the last run
+        are not read again, so a refresh reads only the new files. A new file is still
+        identified by its contents, so a renamed copy of an applied file is skipped.
+
+        path: path, glob pattern or list of either
+        chunksize: number of rows per chunk
+        """
+        applied = []
+        for file in resolve_paths(path):
+            batch_id = self._file_digest(file)
+            if self.append(iter_booking_chunks(file, chunksize=chunksize), batch_id):
+                applied.append(file)
+        return applied
+
+    def _positive_class(self, tab):
+        return "Canceled" if "Canceled" in tab.columns else 1
+
+    def cancellation_rate(self, by):
+        """
+        Share of canceled bookings and number of bookings per level of a column
+
+        by: column name, e.g. "market_segment_type" or "arrival_month"
+        """
+        tab = self.summary.crosstab(by)
+        bookings = tab.sum(axis=1)
+        return pd.DataFrame(
+            {
+                "bookings": bookings,
+                "canceled": tab[self._positive_class(tab)],
+                "cancellation_rate": tab[self._positive_class(tab)] / bookings,
+            }
+        )
+
+    def monthly_guests(self):
+        """
+        Number of bookings per arrival month, as the monthly_data frame of the notebook
+        """
+        counts = self.summary.group_count("arrival_month")
+        return pd.DataFrame({"Month": counts.index, "Guests": counts.to_numpy()})
+
+    def price_upper_whisker(self, whisker_factor=1.5):
+        """
+        Upper whisker of avg_price_per_room over the whole history, from the quantile sketch
+
+        whisker_factor: multiple of the IQR added to the 75th quantile (default 1.5)
+        """
+        return price_upper_whisker(self.price_sketch, whisker_factor)
+
+    def means(self):
+        return pd.Series(
+            {col: self.summary.mean(col) for col in self.summary.numeric_columns}
+        )
+
+    def medians(self):
+        return pd.Series(
+            {col: self.summary.median(col) for col in self.summary.numeric_columns}
+        )
+
+
+def refresh_aggregates(path, state_path=DEFAULT_STATE_PATH, chunksize=500_000):
+    """
+    Apply new feed files to the persisted aggregates and save them
+
+    path: path, glob pattern or list of the feed files
+    state_path: state file
+    chunksize: number of rows per chunk
+    """
+    state = AggregateState.load(state_path)
+    manifest = dict(state.manifest)
+    # newly hashed files are saved too, even when their contents were already applied
+    if state.append_files(path, chunksize=chunksize) or state.manifest != manifest:
+        state.save(state_path)
+    return state
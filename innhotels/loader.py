@@ -0,0 +1,126 @@
+"""
+Loading the INNHotelsGroup booking extract with an explicit schema
+"""
+
+import glob
+import os
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# default location of the extract, can be overridden with the INNHOTELS_DATA variable
+DEFAULT_DATA_PATH = os.environ.get("INNHOTELS_DATA", "INNHotelsGroup.csv")
+
+# the 19 documented columns of the extract, in file order, with the type used to parse them
+BOOKING_DTYPES = {
+    "Booking_ID": "object",
+    "no_of_adults": "int32",
+    "no_of_children": "int32",
+    "no_of_weekend_nights": "int32",
+    "no_of_week_nights": "int32",
+    "type_of_meal_plan": "category",
+    "required_car_parking_space": "int32",
+    "room_type_reserved": "category",
+    "lead_time": "int32",
+    "arrival_year": "int32",
+    "arrival_month": "int32",
+    "arrival_date": "int32",
+    "market_segment_type": "category",
+    "repeated_guest": "int32",
+    "no_of_previous_cancellations": "int32",
+    "no_of_previous_bookings_not_canceled": "int32",
+    "avg_price_per_room": "float64",
+    "no_of_special_requests": "int32",
+    "booking_status": "category",
+}
+
+BOOKING_COLUMNS = list(BOOKING_DTYPES)
+
+
+def resolve_paths(path):
+    """
+    Expand a path or glob pattern into a sorted list of files
+
+    path: path, glob pattern or list of either
+    """
+    patterns = [path] if isinstance(path, (str, os.PathLike)) else list(path)
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(os.fspath(pattern)))
+        paths.extend(matches if matches else [os.fspath(pattern)])
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        raise FileNotFoundError("No booking extract found at: " + ", ".join(missing))
+    return paths
+
+
+def iter_booking_chunks(path=DEFAULT_DATA_PATH, chunksize=500_000, usecols=None, dtypes=None):
+    """
+    Stream the booking extract chunk by chunk
+
+    path: path, glob pattern or list of either
+    chunksize: number of rows per chunk (None reads each file as one chunk)
+    usecols: subset of columns to read (default None, i.e., all 19 columns)
+    dtypes: column types to parse with (default BOOKING_DTYPES)
+    """
+    dtypes = BOOKING_DTYPES if dtypes is None else dtypes
+    columns = BOOKING_COLUMNS if usecols is None else list(usecols)
+    unknown = set(columns) - set(dtypes)
+    if unknown:
+        raise ValueError("Unknown booking columns: " + ", ".join(sorted(unknown)))
+    dtype = {col: dtypes[col] for col in columns}
+
+    for file in resolve_paths(path):
+        if chunksize is None:
+            yield pd.read_csv(file, usecols=columns, dtype=dtype)[columns]
+            continue
+        with pd.read_csv(file, usecols=columns, dtype=dtype, chunksize=chunksize) as reader:
+            for chunk in reader:
+                # keep the documented column order whatever the order in the file
+                yield chunk[columns]
+
+
+def concat_chunks(chunks):
+    """
+    Concatenate booking chunks, unioning categorical levels so they stay categorical
+
+    chunks: iterable of dataframes with the same columns
+    """
+    chunks = list(chunks)
+    if not chunks:
+        raise ValueError("No booking chunks to concatenate")
+    if len(chunks) == 1:
+        return chunks[0].reset_index(drop=True)
+
+    columns = {}
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            # sorted levels match a single read, so drop_first drops the same level
+            columns[col] = pd.Series(
+                union_categoricals(
+                    [chunk[col] for chunk in chunks], sort_categories=True
+                ),
+                name=col,
+            )
+        else:
+            columns[col] = pd.concat(
+                [chunk[col] for chunk in chunks], ignore_index=True
+            )
+        # release the chunk columns as we go so peak memory stays near one copy
+        for chunk in chunks:
+            del chunk[col]
+    return pd.DataFrame(columns)
+
+
+def load_bookings(path=DEFAULT_DATA_PATH, chunksize=None, usecols=None, dtypes=None):
+    """
+    Load the booking extract into a single dataframe with an explicit schema
+
+    path: path, glob pattern or list of either
+    chunksize: number of rows per chunk (default None, i.e., read each file in one go)
+    usecols: subset of columns to read (default None, i.e., all 19 columns)
+    dtypes: column types to parse with (default BOOKING_DTYPES)
+    """
+    return concat_chunks(
+        iter_booking_chunks(path, chunksize=chunksize, usecols=usecols, dtypes=dtypes)
+    )
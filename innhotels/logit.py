@@ -0,0 +1,530 @@
+"""
+Logit fits over chunks of a dense, memory-mapped or sparse design, like sm.Logit
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# rows per pass over the design, the only dense float64 block ever materialised
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def _is_sparse(X):
+    return hasattr(X, "tocsr") and not isinstance(X, (np.ndarray, pd.DataFrame))
+
+
+def _design_names(X, names=None):
+    if names is not None:
+        return list(names)
+    if isinstance(X, pd.DataFrame):
+        return list(X.columns)
+    return ["x{}".format(i + 1) for i in range(X.shape[1])]
+
+
+def iter_chunks(X, chunksize=DEFAULT_CHUNKSIZE, positions=None):
+    """
+    Blocks of rows of a design as float64 arrays, or CSR matrices for a sparse design
+
+    X: dataframe, array (e.g. memory-mapped) or scipy sparse matrix
+    chunksize: number of rows per block
+    positions: columns to keep, as positions (default None, i.e., all)
+    """
+    sparse = _is_sparse(X)
+    if sparse:
+        X = X.tocsr()
+    for start in range(0, X.shape[0], chunksize):
+        if isinstance(X, pd.DataFrame):
+            block = X.iloc[start : start + chunksize]
+            if positions is not None:
+                block = block.iloc[:, positions]
+            yield block.to_numpy(dtype=np.float64)
+        elif sparse:
+            block = X[start : start + chunksize]
+            block = block if positions is None else block[:, positions]
+            yield block.astype(np.float64)
+        else:
+            block = X[start : start + chunksize]
+            block = block if positions is None else block[:, positions]
+            yield np.asarray(block, dtype=np.float64)
+
+
+def _pass(X, y, params, chunksize, positions, hessian=True):
+    """
+    Log-likelihood, gradient and (optionally) Hessian of the logit in one pass
+    """
+    llf, gradient = 0.0, np.zeros(len(params))
+    information = np.zeros((len(params), len(params))) if hessian else None
+    start = 0
+    for block in iter_chunks(X, chunksize, positions):
+        stop = start + block.shape[0]
+        target = y[start:stop]
+        linear = np.asarray(block @ params).ravel()
+        prob = 0.5 * (1.0 + np.tanh(0.5 * linear))  # stable logistic function
+        llf += float(np.dot(target, linear) - np.logaddexp(0.0, linear).sum())
+        gradient += np.asarray(block.T @ (target - prob)).ravel()
+        if hessian:
+            weights = prob * (1.0 - prob)
+            if _is_sparse(block):
+                weighted = block.multiply(weights[:, None]).tocsr()
+                information += np.asarray((block.T @ weighted).todense())
+            else:
+                information += (block * weights[:, None]).T @ block
+        start = stop
+    return llf, gradient, information
+
+
+def _solve(matrix, vector):
+    try:
+        return np.linalg.solve(matrix, vector)
+    except np.linalg.LinAlgError:
+        return np.linalg.lstsq(matrix, vector, rcond=None)[0]
+
+
+def _irls(X, y, params, chunksize, positions, maxiter, tol):
+    """
+    Newton (IRLS) iterations with step halving, from params
+
+    Returns the coefficients, their log-likelihood and information matrix, the number
+    of iterations and whether the largest coefficient change fell below tol.
+    """
+    llf, gradient, information = _pass(X, y, params, chunksize, positions)
+    if len(params) == 0:
+        return params, llf, information, 0, True  # the empty model has nothing to fit
+    for iteration in range(1, maxiter + 1):
+        step = _solve(information, gradient)
+        # steps are halved until the log-likelihood increases
+        for _ in range(30):
+            state = _pass(X, y, params + step, chunksize, positions)
+            if state[0] >= llf - 1e-12 * abs(llf):
+                break
+            step = step / 2
+        params = params + step
+        llf, gradient, information = state
+        if np.abs(step).max() < tol:
+            return params, llf, information, iteration, True
+    return params, llf, information, maxiter, False
+
+
+def _standardising_map(mean, variance, constant):
+    """
+    Matrix A such that X @ A has unit-variance columns, centred through the constant
+
+    Coefficients gamma of the standardised design are those of the original one as
+    A @ gamma, so an optimiser can work on gamma without a standardised copy of X.
+    Without a constant column the columns can only be scaled, not centred.
+    """
+    A = np.eye(len(mean))
+    varying = ~constant & (variance > 0)
+    if constant.any():
+        c = np.flatnonzero(constant)[0]
+        scale = np.sqrt(variance[varying])
+        A[varying, varying] = 1 / scale
+        A[c, varying] = -mean[varying] / (scale * mean[c])
+    else:
+        A[varying, varying] = 1 / np.sqrt(mean[varying] ** 2 + variance[varying])
+    return A
+
+
+def _lbfgs(X, y, params, chunksize, positions, maxiter, tol, transform):
+    from scipy.optimize import minimize
+
+    n_obs = len(y)
+
+    def loss(gamma):
+        llf, gradient, _ = _pass(
+            X, y, transform @ gamma, chunksize, positions, hessian=False
+        )
+        return -llf / n_obs, -(transform.T @ gradient) / n_obs
+
+    # unscaled columns such as arrival_year next to const stall L-BFGS from a cold start
+    result = minimize(
+        loss,
+        np.linalg.solve(transform, params),
+        jac=True,
+        method="L-BFGS-B",
+        options={"maxiter": maxiter, "gtol": tol, "ftol": 1e-15},
+    )
+    params = transform @ result.x
+    # one pass with the information matrix at the optimum, for the standard errors
+    llf, _, information = _pass(X, y, params, chunksize, positions)
+    return params, llf, information, result.nit, bool(result.success)
+
+
+def fit_logit(
+    X,
+    y,
+    columns=None,
+    names=None,
+    method="irls",
+    start_params=None,
+    maxiter=None,
+    tol=None,
+    chunksize=DEFAULT_CHUNKSIZE,
+):
+    """
+    Maximum likelihood logit fit without a dense float64 copy of the design
+
+    The design is read in blocks of chunksize rows, so a memory-mapped feature store or
+    the sparse one-hot output of DummyEncoder.transform(..., sparse=True) can be fitted
+    on millions of bookings. "irls" takes Newton (IRLS) steps from the p x p information
+    matrix accumulated over the blocks, like sm.Logit(...).fit(); "lbfgs" only needs the
+    gradient per pass, for designs with many dummy columns, and works on standardised
+    columns (centred through the constant) so unscaled predictors don't stall it.
+    Either way one more pass gives the information matrix the standard errors come
+    from, and a fit that doesn't converge raises a ConvergenceWarning, as statsmodels.
+
+    X: dataframe, array (e.g. memory-mapped) or scipy sparse matrix, constant included
+    y: 0/1 target
+    columns: names of the columns to fit on (default None, i.e., all)
+    names: names of the columns of X (default None, i.e., the dataframe's columns)
+    method: "irls" or "lbfgs" (default "irls")
+    start_params: starting coefficients (default None, i.e., zeros)
+    maxiter: most iterations (default None, i.e., 35 for irls and 500 for lbfgs)
+    tol: convergence tolerance, on the coefficient change for irls and on the
+        gradient for lbfgs (default None, i.e., 1e-8 and 1e-10)
+    chunksize: number of rows per block
+    """
+    names = _design_names(X, names)
+    positions = None
+    if columns is not None:
+        lookup = {name: i for i, name in enumerate(names)}
+        positions = [lookup[col] for col in columns]
+        names = list(columns)
+    endog_name = y.name if isinstance(y, pd.Series) else None
+    y = np.asarray(y, dtype=np.float64)
+    params = np.zeros(len(names))
+    if start_params is not None:
+        params = np.array(start_params, dtype=np.float64)
+
+    if method not in ("irls", "lbfgs"):
+        raise ValueError("method must be 'irls' or 'lbfgs', got " + repr(method))
+    mean, variance = _column_moments(X, chunksize, positions)
+    constant = (variance <= 1e-12 * np.maximum(mean ** 2, 1.0)) & (mean != 0)
+    if method == "irls":
+        fit = _irls(X, y, params, chunksize, positions, maxiter or 35, tol or 1e-8)
+    else:
+        transform = _standardising_map(mean, variance, constant)
+        fit = _lbfgs(
+            X, y, params, chunksize, positions, maxiter or 500, tol or 1e-10, transform
+        )
+    params, llf, information, iterations, converged = fit
+    if not converged:
+        from statsmodels.tools.sm_exceptions import ConvergenceWarning
+
+        warnings.warn(
+            "{} did not converge in {} iterations, the results may be wrong".format(
+                method, iterations
+            ),
+            ConvergenceWarning,
+        )
+
+    return LogitResults(
+        params,
+        information,
+        names,
+        llf=llf,
+        n_obs=len(y),
+        y_mean=y.mean(),
+        k_constant=int(constant.any()),
+        converged=converged,
+        iterations=iterations,
+        method=method,
+        endog_name=endog_name,
+    )
+
+
+def _column_moments(X, chunksize, positions):
+    """
+    Mean and variance of every column, in one pass
+    """
+    total = total_sq = 0.0
+    for block in iter_chunks(X, chunksize, positions):
+        squares = block.multiply(block) if _is_sparse(block) else block * block
+        total = total + np.asarray(block.sum(axis=0)).ravel()
+        total_sq = total_sq + np.asarray(squares.sum(axis=0)).ravel()
+    mean = total / X.shape[0]
+    return mean, total_sq / X.shape[0] - mean ** 2
+
+
+def wald_tests(params, cov):
+    """
+    Standard errors, z statistics and two-sided p-values of the coefficients
+
+    params: coefficients, as a named series
+    cov: covariance matrix of the coefficients
+    """
+    from scipy import stats
+
+    bse = pd.Series(np.sqrt(np.diag(cov)), index=params.index)
+    tvalues = params / bse
+    pvalues = pd.Series(2 * stats.norm.sf(np.abs(tvalues)), index=params.index)
+    return bse, tvalues, pvalues
+
+
+def predict_logit(params, exog, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Probabilities of the positive class, a series for a dataframe and an array otherwise
+
+    params: coefficients, as a named series
+    exog: design with the fitted columns, as a dataframe, array or sparse matrix
+    chunksize: number of rows per block
+    """
+    if isinstance(exog, pd.DataFrame):
+        exog = exog[list(params.index)]
+    coef = params.to_numpy()
+    linear = np.concatenate(
+        [np.asarray(block @ coef).ravel() for block in iter_chunks(exog, chunksize)]
+        or [np.empty(0)]
+    )
+    prob = 0.5 * (1.0 + np.tanh(0.5 * linear))  # stable logistic function
+    if isinstance(exog, pd.DataFrame):
+        return pd.Series(prob, index=exog.index)
+    return prob
+
+
+def odds_table(params):
+    """
+    Odds and percentage change in odds of every coefficient
+
+    params: coefficients, as a named series
+    """
+    odds = np.exp(params)
+    return pd.DataFrame({"Odds": odds, "Change_odd%": (odds - 1) * 100})
+
+
+class LogitResults:
+    """
+    Coefficients, standard errors and p-values of a logit fit, named like statsmodels'
+
+    Carries what the notebook reads from sm.Logit(...).fit(): params, bse, pvalues,
+    llf, summary() and predict(), so the performance and odds-ratio cells and
+    export_logit work the same with either backend.
+
+    params: fitted coefficients
+    information: observed information matrix (X'WX) at the coefficients
+    names: names of the coefficients
+    llf: log-likelihood at the coefficients
+    n_obs: number of rows fitted on
+    y_mean: share of positive rows, for the log-likelihood of the null model
+    k_constant: 1 if the design has a constant column, else 0
+    converged: whether the optimiser converged
+    iterations: iterations of the optimiser
+    method: optimiser used, "irls" or "lbfgs"
+    endog_name: name of the target (default None, i.e., "y")
+    """
+
+    def __init__(
+        self,
+        params,
+        information,
+        names,
+        llf,
+        n_obs,
+        y_mean,
+        k_constant,
+        converged,
+        iterations,
+        method,
+        endog_name=None,
+    ):
+        from scipy import stats
+
+        self.params = pd.Series(params, index=names)
+        try:
+            cov = np.linalg.inv(information)
+        except np.linalg.LinAlgError:
+            cov = np.linalg.pinv(information)
+        self.normalized_cov_params = pd.DataFrame(cov, index=names, columns=names)
+        self.bse, self.tvalues, self.pvalues = wald_tests(self.params, cov)
+        self.llf = llf
+        self.nobs = n_obs
+        self.k_constant = k_constant
+        self.df_model = len(names) - k_constant
+        self.df_resid = n_obs - len(names)
+        # the null model has the constant only, as in statsmodels
+        self.llnull = n_obs * (
+            y_mean * np.log(y_mean) + (1 - y_mean) * np.log(1 - y_mean)
+        )
+        self.prsquared = 1 - llf / self.llnull
+        self.llr = 2 * (llf - self.llnull)
+        self.llr_pvalue = stats.chi2.sf(self.llr, self.df_model)
+        self.aic = -2 * llf + 2 * len(names)
+        self.bic = -2 * llf + np.log(n_obs) * len(names)
+        self.converged = converged
+        self.iterations = iterations
+        self.method = method
+        self.endog_name = endog_name or "y"
+
+    def cov_params(self):
+        return self.normalized_cov_params
+
+    def conf_int(self, alpha=0.05):
+        """
+        Confidence intervals of the coefficients
+
+        alpha: significance level (default 0.05)
+        """
+        from scipy import stats
+
+        q = stats.norm.ppf(1 - alpha / 2)
+        return pd.DataFrame(
+            {0: self.params - q * self.bse, 1: self.params + q * self.bse}
+        )
+
+    def predict(self, exog, chunksize=DEFAULT_CHUNKSIZE):
+        """
+        Probabilities of the positive class
+
+        exog: design with the fitted columns, as a dataframe, array or sparse matrix
+        chunksize: number of rows per block
+        """
+        return predict_logit(self.params, exog, chunksize)
+
+    def odds_table(self):
+        """
+        Odds and percentage change in odds of every coefficient
+        """
+        return odds_table(self.params)
+
+    def summary(self):
+        """
+        Text summary in the layout of statsmodels' Logit summary
+        """
+        rows = [
+            ("Dep. Variable:", self.endog_name, "No. Observations:", self.nobs),
+            ("Model:", "Logit", "Df Residuals:", self.df_resid),
+            ("Method:", self.method.upper(), "Df Model:", self.df_model),
+            ("Converged:", self.converged, "Pseudo R-squ.:", round(self.prsquared, 4)),
+            ("Iterations:", self.iterations, "Log-Likelihood:", round(self.llf, 2)),
+            ("", "", "LL-Null:", round(self.llnull, 2)),
+            ("", "", "LLR p-value:", "{:.3g}".format(self.llr_pvalue)),
+        ]
+        header = [
+            "{:<16}{:>22}   {:<20}{:>20}".format(*[str(cell) for cell in row])
+            for row in rows
+        ]
+        conf = self.conf_int()
+        table = pd.DataFrame(
+            {
+                "coef": self.params,
+                "std err": self.bse,
+                "z": self.tvalues,
+                "P>|z|": self.pvalues,
+                "[0.025": conf[0],
+                "0.975]": conf[1],
+            }
+        )
+        width = 81
+        lines = ["Logit Regression Results".center(width), "=" * width]
+        lines += header
+        lines += ["=" * width, table.to_string(float_format="{:.4f}".format)]
+        lines += ["=" * width]
+        return "\n".join(lines)
+
+
+class OnlineLogit:
+    """
+    Logit coefficients refreshed batch by batch with recursive IRLS
+
+    The fit so far is summarised by its coefficients and information matrix, i.e., a
+    Gaussian approximation of the log-likelihood of the bookings already seen. A new
+    batch adds its own log-likelihood and one Newton step from the current coefficients
+    maximises the sum, so an update reads only the batch (O(b p^2 + p^3)) and the
+    result tracks a full refit on all the bookings seen. With decay < 1 the
+    information of the older batches is multiplied by decay before every update, so
+    the coefficients follow recent behaviour with an effective memory of about
+    1 / (1 - decay) batches.
+
+    names: names of the coefficients, the columns a batch must have
+    params: starting coefficients
+    information: information matrix of params (X'WX of the data they were fitted on)
+    nobs: number of bookings params were fitted on (default 0)
+    decay: weight kept by the older batches at each update, in (0, 1] (default 1)
+    """
+
+    def __init__(self, names, params, information, nobs=0, decay=1.0):
+        if not 0 < decay <= 1:
+            raise ValueError("decay must be in (0, 1], got " + repr(decay))
+        self.names = list(names)
+        self.params = pd.Series(np.array(params, dtype=np.float64), index=self.names)
+        self.information = np.array(information, dtype=np.float64)
+        self.nobs = nobs
+        self.decay = decay
+        self.n_updates = 0
+
+    @classmethod
+    def from_results(cls, results, decay=1.0):
+        """
+        Start from a fitted model, sm.Logit(...).fit() or fit_logit
+
+        results: fitted results with params, cov_params() and nobs
+        decay: weight kept by the older batches at each update (default 1)
+        """
+        cov = np.asarray(results.cov_params(), dtype=np.float64)
+        try:
+            information = np.linalg.inv(cov)
+        except np.linalg.LinAlgError:
+            information = np.linalg.pinv(cov)
+        return cls(results.params.index, results.params, information, results.nobs, decay)
+
+    def update(self, X, y, steps=1, chunksize=DEFAULT_CHUNKSIZE):
+        """
+        Add a batch of bookings to the fit, in place
+
+        The information matrix kept for the next update is the batch's at the updated
+        coefficients, which takes one more pass over the batch.
+
+        X: batch design with the model's columns, as a dataframe, array or sparse matrix
+        y: 0/1 target of the batch
+        steps: Newton steps on the batch, at least 1 (default 1, more for large batches
+            that move the coefficients far)
+        chunksize: number of rows per block
+        """
+        if steps < 1:
+            raise ValueError("steps must be at least 1, got " + repr(steps))
+        if isinstance(X, pd.DataFrame):
+            X = X[self.names]
+        y = np.asarray(y, dtype=np.float64)
+        prior_params = self.params.to_numpy()
+        prior_information = self.decay * self.information
+        params = prior_params
+        for _ in range(steps):
+            _, gradient, information = _pass(X, y, params, chunksize, None)
+            # the older batches pull the coefficients back to where they left them
+            gradient = gradient - prior_information @ (params - prior_params)
+            params = params + _solve(prior_information + information, gradient)
+        _, _, information = _pass(X, y, params, chunksize, None)
+        self.params = pd.Series(params, index=self.names)
+        self.information = prior_information + information
+        self.nobs = self.decay * self.nobs + len(y)
+        self.n_updates += 1
+        return self
+
+    def cov_params(self):
+        cov = np.linalg.pinv(self.information)
+        return pd.DataFrame(cov, index=self.names, columns=self.names)
+
+    @property
+    def bse(self):
+        return wald_tests(self.params, self.cov_params().to_numpy())[0]
+
+    @property
+    def pvalues(self):
+        return wald_tests(self.params, self.cov_params().to_numpy())[2]
+
+    def predict(self, exog, chunksize=DEFAULT_CHUNKSIZE):
+        """
+        Probabilities of the positive class with the current coefficients
+
+        exog: design with the model's columns, as a dataframe, array or sparse matrix
+        chunksize: number of rows per block
+        """
+        return predict_logit(self.params, exog, chunksize)
+
+    def odds_table(self):
+        """
+        Odds and percentage change in odds of every coefficient
+        """
+        return odds_table(self.params)
@@ -0,0 +1,356 @@
+"""
+Plotting helpers of the EDA, shared by the notebook and the batch report
+"""
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+from innhotels.cube import CountCube
+from innhotels.summary import weighted_quantile
+
+
+def numeric_summary(values=None, counts=None, bins=None, whis=1.5, max_fliers=2000):
+    """
+    Everything histogram_boxplot draws, computed in one vectorised pass
+
+    values: array of the column (raw values)
+    counts: series of counts indexed by value, e.g. value_counts() or BookingSummary,
+        used instead of values
+    bins: number of bins or bin edges of the histogram (default None, i.e., numpy's "auto" rule)
+    whis: reach of the whiskers as a multiple of the IQR (default 1.5)
+    max_fliers: most outliers to draw, evenly spread and including the extremes (default 2000)
+    """
+    if counts is not None:
+        counts = counts.sort_index()
+        values = counts.index.to_numpy(dtype=float)
+        weights = counts.to_numpy(dtype=float)
+        q1, median, q3 = weighted_quantile(values, weights, [0.25, 0.5, 0.75])
+    else:
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        weights = None
+        q1, median, q3 = np.percentile(values, [25, 50, 75])
+    n = len(values) if weights is None else weights.sum()
+    mean = np.average(values, weights=weights)
+
+    iqr = q3 - q1
+    inside = (values >= q1 - whis * iqr) & (values <= q3 + whis * iqr)
+    if bins is None:
+        # numpy's "auto" rule: the finer of the Sturges and Freedman-Diaconis bin widths
+        span = values.max() - values.min()
+        sturges = span / (np.log2(n) + 1)
+        fd = 2 * iqr / np.cbrt(n)
+        width = min(sturges, fd) if fd > 0 else sturges
+        bins = max(1, int(np.ceil(span / width))) if width > 0 else 1
+    hist, edges = np.histogram(values, bins=bins, weights=weights)
+    fliers = np.unique(values[~inside])  # distinct values are enough to draw the outliers
+    if len(fliers) > max_fliers:
+        fliers = fliers[np.linspace(0, len(fliers) - 1, max_fliers).round().astype(int)]
+    return {
+        "box": {
+            "med": median,
+            "q1": q1,
+            "q3": q3,
+            "mean": mean,
+            "whislo": values[inside].min(),
+            "whishi": values[inside].max(),
+            "fliers": fliers,
+        },
+        "hist": hist,
+        "edges": edges,
+        "mean": mean,
+        "median": median,
+    }
+
+
+def histogram_boxplot(data, feature, figsize=(15, 10), kde=False, bins=None, summary=None):
+    """
+    Boxplot and histogram combined
+
+    Drawn from a numeric_summary, so the cost does not depend on the number of rows.
+
+    data: dataframe (or None when summary is given)
+    feature: dataframe column
+    figsize: size of figure (default (15,10))
+    kde: whether to show the density curve (default False), needs the raw data
+    bins: number of bins for histogram (default None)
+    summary: precomputed numeric_summary of the column (default None, i.e., computed from data)
+    """
+    if summary is None:
+        summary = numeric_summary(data[feature].to_numpy(), bins=bins)
+    f2, (ax_box2, ax_hist2) = plt.subplots(
+        nrows=2,  # Number of rows of the subplot grid= 2
+        sharex=True,  # x-axis will be shared among all subplots
+        gridspec_kw={"height_ratios": (0.25, 0.75)},
+        figsize=figsize,
+    )  # creating the 2 subplots
+    ax_box2.bxp(
+        [summary["box"]],
+        orientation="horizontal",
+        showmeans=True,
+        patch_artist=True,
+        widths=0.8,
+        boxprops={"facecolor": "violet"},
+        medianprops={"color": "black"},
+        meanprops={"marker": "^", "markerfacecolor": "green", "markeredgecolor": "green"},
+    )  # boxplot will be created and a triangle will indicate the mean value of the column
+    ax_box2.set_yticks([])
+    edges = summary["edges"]
+    ax_hist2.bar(
+        edges[:-1],
+        summary["hist"],
+        width=np.diff(edges),
+        align="edge",
+        alpha=0.75,
+        edgecolor="white",
+    )  # For histogram
+    if kde:
+        if data is None:
+            raise ValueError("kde needs the raw data")
+        grid, densities = binned_kde(data[feature].to_numpy())
+        # scaled from density to counts per bin, like the histogram
+        ax_hist2.plot(grid, densities[0] * summary["hist"].sum() * np.diff(edges).mean())
+    ax_hist2.set_xlabel(feature)
+    ax_hist2.set_ylabel("Count")
+    ax_hist2.axvline(
+        summary["mean"], color="green", linestyle="--"
+    )  # Add mean to the histogram
+    ax_hist2.axvline(
+        summary["median"], color="black", linestyle="-"
+    )  # Add median to the histogram
+
+
+def labeled_barplot(data, feature, perc=False, n=None, counts=None):
+    """
+    Barplot with percentage at the top
+
+    data: dataframe (or None when counts is given)
+    feature: dataframe column
+    perc: whether to display percentages instead of count (default is False)
+    n: displays the top n category levels (default is None, i.e., display all levels)
+    counts: precomputed value counts of the column, e.g. from BookingSummary
+        (default None, i.e., computed from data)
+    """
+    if counts is None:
+        counts = data[feature].value_counts()  # the only pass over the data
+    else:
+        counts = counts.sort_values(ascending=False, kind="stable")
+    total = counts.sum()  # length of the column
+    count = len(counts)
+    if n is None:
+        plt.figure(figsize=(count + 2, 6))
+    else:
+        plt.figure(figsize=(n + 2, 6))
+
+    counts = counts.iloc[:n]
+    plt.xticks(rotation=90, fontsize=15)
+    ax = plt.gca()
+    bars = ax.bar(
+        [str(level) for level in counts.index],
+        counts.to_numpy(),
+        color=sns.color_palette("Paired", len(counts)),
+    )
+    ax.set_xlabel(feature)
+    ax.set_ylabel("count")
+
+    for p in bars.patches:
+        if perc == True:
+            label = "{:.1f}%".format(
+                100 * p.get_height() / total
+            )  # percentage of each class of the category
+        else:
+            label = int(p.get_height())  # count of each level of the category
+
+        x = p.get_x() + p.get_width() / 2  # width of the plot
+        y = p.get_height()  # height of the plot
+
+        ax.annotate(
+            label,
+            (x, y),
+            ha="center",
+            va="center",
+            size=12,
+            xytext=(0, 5),
+            textcoords="offset points",
+        )  # annotate the percentage
+
+    plt.show()  # show the plot
+
+
+def binned_kde(values, groups=None, n_groups=1, grid_size=512, bw_method="scott"):
+    """
+    Gaussian kernel density estimates on a fixed grid, by linear binning and FFT convolution
+
+    The rows are binned once onto the grid (all groups in a single bincount), and each
+    density is the convolution of its bin counts with the sampled kernel, so the cost is
+    one pass over the rows plus O(grid_size log grid_size) per group. Matches
+    scipy.stats.gaussian_kde (Scott's rule per group) up to the binning error.
+
+    values: array of the column
+    groups: integer group code of every row, e.g. the target class (default None, i.e., one group)
+    n_groups: number of groups (default 1)
+    grid_size: number of grid points (default 512)
+    bw_method: "scott" or a bandwidth factor like gaussian_kde's (default "scott")
+    """
+    values = np.asarray(values, dtype=float)
+    groups = np.zeros(len(values)) if groups is None else np.asarray(groups)
+    groups = groups.astype(np.int64)
+    keep = ~np.isnan(values) & (groups >= 0)
+    values, groups = values[keep], groups[keep]
+
+    lo, hi = values.min(), values.max()
+    if hi == lo:
+        lo, hi = lo - 0.5, hi + 0.5
+    grid = np.linspace(lo, hi, grid_size)
+    dx = grid[1] - grid[0]
+
+    # linear binning: every row splits its weight between the two nearest grid points
+    position = (values - lo) / dx
+    left = np.minimum(np.floor(position).astype(np.int64), grid_size - 2)
+    right_weight = position - left
+    cells = groups * grid_size + left
+    size = n_groups * grid_size
+    binned = np.bincount(cells, weights=1 - right_weight, minlength=size) + np.bincount(
+        cells + 1, weights=right_weight, minlength=size
+    )
+    binned = binned.reshape(n_groups, grid_size)
+
+    # per group size and standard deviation for the bandwidth, also in one bincount each
+    n = np.bincount(groups, minlength=n_groups).astype(float)
+    total = np.bincount(groups, weights=values, minlength=n_groups)
+    squares = np.bincount(groups, weights=values ** 2, minlength=n_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / n
+        std = np.sqrt(np.maximum(squares / n - mean ** 2, 0) * n / (n - 1))
+
+    densities = np.zeros((n_groups, grid_size))
+    for g in range(n_groups):
+        if n[g] < 2 or not std[g] > 0:
+            continue
+        factor = n[g] ** (-1 / 5) if bw_method == "scott" else float(bw_method)
+        bandwidth = std[g] * factor
+        reach = min(grid_size - 1, int(np.ceil(4 * bandwidth / dx)))
+        offsets = np.arange(-reach, reach + 1) * dx
+        kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+        size = grid_size + 2 * reach
+        fft_size = 1 << int(np.ceil(np.log2(size)))
+        convolved = np.fft.irfft(
+            np.fft.rfft(binned[g], fft_size) * np.fft.rfft(kernel, fft_size), fft_size
+        )
+        densities[g] = np.maximum(convolved[reach: reach + grid_size], 0) / n[g]
+    return grid, densities
+
+
+def distribution_plot_wrt_target(data, predictor, target, kde="binned", bins="auto"):
+    """
+    Density of a predictor for each of the two target classes, and boxplots w.r.t the target
+
+    data: dataframe
+    predictor: independent variable
+    target: target variable
+    kde: "binned" for the binned FFT density (default), True for seaborn's exact one,
+        False for none
+    bins: bins of the histograms, shared by both classes (default "auto")
+    """
+    fig, axs = plt.subplots(2, 2, figsize=(12, 10))
+
+    target_uniq = data[target].unique()
+
+    if kde is True:
+        axs[0, 0].set_title("Distribution of target for target=" + str(target_uniq[0]))
+        sns.histplot(
+            data=data[data[target] == target_uniq[0]],
+            x=predictor,
+            kde=True,
+            ax=axs[0, 0],
+            color="teal",
+            stat="density",
+        )
+
+        axs[0, 1].set_title("Distribution of target for target=" + str(target_uniq[1]))
+        sns.histplot(
+            data=data[data[target] == target_uniq[1]],
+            x=predictor,
+            kde=True,
+            ax=axs[0, 1],
+            color="orange",
+            stat="density",
+        )
+    else:
+        values = data[predictor].to_numpy(dtype=float)
+        # class code of every row, the bins and the densities are shared by both panels
+        classes = pd.Categorical(data[target], categories=target_uniq[:2]).codes
+        edges = np.histogram_bin_edges(values[~np.isnan(values)], bins=bins)
+        position = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+        valid = (classes >= 0) & ~np.isnan(values)
+        hist = np.bincount(
+            classes[valid].astype(np.int64) * (len(edges) - 1) + position[valid],
+            minlength=2 * (len(edges) - 1),
+        ).reshape(2, -1)
+        if kde:
+            grid, densities = binned_kde(values, classes, n_groups=2)
+
+        for g, (ax, color) in enumerate([(axs[0, 0], "teal"), (axs[0, 1], "orange")]):
+            ax.set_title("Distribution of target for target=" + str(target_uniq[g]))
+            ax.bar(
+                edges[:-1],
+                hist[g] / max(hist[g].sum(), 1) / np.diff(edges),
+                width=np.diff(edges),
+                align="edge",
+                color=color,
+                alpha=0.5,
+                edgecolor="white",
+            )
+            if kde:
+                ax.plot(grid, densities[g], color=color)
+            ax.set_xlabel(predictor)
+            ax.set_ylabel("Density")
+
+    axs[1, 0].set_title("Boxplot w.r.t target")
+    sns.boxplot(data=data, x=target, y=predictor, ax=axs[1, 0], palette="gist_rainbow")
+
+    axs[1, 1].set_title("Boxplot (without outliers) w.r.t target")
+    sns.boxplot(
+        data=data,
+        x=target,
+        y=predictor,
+        ax=axs[1, 1],
+        showfliers=False,
+        palette="gist_rainbow",
+    )
+
+    plt.tight_layout()
+    plt.show()
+
+
+def stacked_barplot(data, predictor, target, cube=None):
+    """
+    Print the category counts and plot a stacked bar chart
+
+    data: dataframe (or None when cube holds the predictor)
+    predictor: independent variable
+    target: target variable
+    cube: CountCube of the data with the predictor (default None, i.e., counted from data)
+    """
+    if cube is None or predictor not in cube:
+        # a single counting pass serves both tables
+        cube = CountCube.from_frame(data[[predictor, target]], target, columns=[predictor])
+    counts = cube.crosstab(predictor)
+    count = len(counts)
+    sorter = cube.class_counts().sort_values(ascending=False, kind="stable").index[-1]
+    tab1 = cube.crosstab(predictor, margins=True).sort_values(
+        by=sorter, ascending=False
+    )
+    print(tab1)
+    print("-" * 120)
+    tab = cube.crosstab(predictor, normalize="index").sort_values(
+        by=sorter, ascending=False
+    )
+    tab.plot(kind="bar", stacked=True, figsize=(count + 5, 5))
+    plt.legend(
+        loc="lower left", frameon=False,
+    )
+    plt.legend(loc="upper left", bbox_to_anchor=(1, 1))
+    plt.show()
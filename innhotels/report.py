@@ -0,0 +1,167 @@
+"""
+Headless batch rendering of the EDA plots into image files and an index page
+"""
+
+import contextlib
+import html
+import io
+import os
+import warnings
+
+import pandas as pd
+
+# numeric columns with more distinct values than this get a histogram, the others a barplot
+MAX_BARPLOT_LEVELS = 30
+
+_worker_data = None
+
+
+def default_plots(data, target="booking_status"):
+    """
+    Plots of the EDA for every relevant column, as (helper name, arguments) tasks
+
+    data: dataframe
+    target: name of the target column (default "booking_status")
+    """
+    plots = []
+    for col in data.columns:
+        if col == target:
+            plots.append(("labeled_barplot", (col,), {"perc": True}))
+            continue
+        series = data[col]
+        many_levels = (
+            pd.api.types.is_numeric_dtype(series) and series.nunique() > MAX_BARPLOT_LEVELS
+        )
+        if many_levels:
+            plots.append(("histogram_boxplot", (col,), {}))
+            plots.append(("distribution_plot_wrt_target", (col, target), {}))
+        else:
+            plots.append(("labeled_barplot", (col,), {"perc": True}))
+            plots.append(("stacked_barplot", (col, target), {}))
+    return plots
+
+
+def with_exact_summaries(plots, data, target="booking_status"):
+    """
+    Add the full data's summaries to the plots that draw tables or counts
+
+    Used when the workers draw from a sample: histograms, barplots and stacked barplots
+    still show the exact counts of the full data, only the other plots use the sample.
+
+    plots: list of (helper name, arguments, keyword arguments)
+    data: full dataframe
+    target: name of the target column (default "booking_status")
+    """
+    from innhotels.cube import CountCube
+    from innhotels.plots import numeric_summary
+
+    cube = None
+    exact = []
+    for name, args, kwargs in plots:
+        kwargs = dict(kwargs)
+        col = args[0]
+        if name == "histogram_boxplot" and not ("summary" in kwargs or kwargs.get("kde")):
+            values = data[col].to_numpy()
+            kwargs["summary"] = numeric_summary(values, bins=kwargs.get("bins"))
+        elif name == "labeled_barplot" and "counts" not in kwargs:
+            kwargs["counts"] = data[col].value_counts()
+        elif name == "stacked_barplot" and "cube" not in kwargs:
+            if cube is None:
+                cube = CountCube.from_frame(data, target)  # one pass for every predictor
+            kwargs["cube"] = cube
+        exact.append((name, args, kwargs))
+    return exact
+
+
+def _init_worker(data):
+    global _worker_data
+    import matplotlib
+
+    matplotlib.use("Agg", force=True)  # no display, figures are only written to files
+    warnings.filterwarnings("ignore")
+    _worker_data = data
+
+
+def _render(task):
+    import matplotlib.pyplot as plt
+
+    from innhotels import plots
+
+    position, name, args, kwargs, out_dir, fmt, dpi = task
+    stem = "{:03d}_{}_{}".format(position, name, "_".join(map(str, args)))
+    text = io.StringIO()
+    try:
+        # tables printed by the helpers (e.g. stacked_barplot) are kept next to the image
+        with contextlib.redirect_stdout(text):
+            getattr(plots, name)(_worker_data, *args, **kwargs)
+        files = []
+        for number in plt.get_fignums():
+            suffix = "" if number == plt.get_fignums()[0] else "_{}".format(number)
+            file = "{}{}.{}".format(stem, suffix, fmt)
+            plt.figure(number).savefig(os.path.join(out_dir, file), dpi=dpi, bbox_inches="tight")
+            files.append(file)
+    finally:
+        plt.close("all")  # keeps the worker's memory bounded
+    return {"name": name, "args": args, "files": files, "text": text.getvalue()}
+
+
+def _write_index(results, out_dir, title):
+    parts = ["<html><head><title>{0}</title></head><body><h1>{0}</h1>".format(html.escape(title))]
+    for result in results:
+        heading = "{}({})".format(result["name"], ", ".join(map(str, result["args"])))
+        parts.append("<h2>{}</h2>".format(html.escape(heading)))
+        if result["text"]:
+            parts.append("<pre>{}</pre>".format(html.escape(result["text"])))
+        for file in result["files"]:
+            parts.append('<img src="{}" style="max-width:100%">'.format(html.escape(file)))
+    parts.append("</body></html>")
+    path = os.path.join(out_dir, "index.html")
+    with open(path, "w") as f:
+        f.write("\n".join(parts))
+    return path
+
+
+def render_report(
+    data,
+    out_dir="eda_report",
+    plots=None,
+    fmt="png",
+    dpi=100,
+    n_jobs=None,
+    title="INN Hotels EDA",
+    sample_size=None,
+    strata=None,
+):
+    """
+    Render every EDA plot to files in a process pool and write an index page
+
+    data: dataframe, sent once to each worker process
+    out_dir: directory of the report
+    plots: list of (helper name, arguments, keyword arguments) (default None, i.e., default_plots(data))
+    fmt: image format, "png" or "svg" (default "png")
+    dpi: resolution of the images (default 100)
+    n_jobs: number of worker processes (default None, i.e., one per core)
+    title: title of the index page
+    sample_size: draw the plots from a stratified sample of this many bookings, the
+        counts and tables still come from the full data (default None, i.e., no sampling)
+    strata: columns of the sample's strata (default None, i.e., booking_status)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    os.makedirs(out_dir, exist_ok=True)
+    plots = default_plots(data) if plots is None else plots
+    if sample_size is not None and sample_size < len(data):
+        from innhotels.sampling import stratified_sample
+
+        plots = with_exact_summaries(plots, data)
+        data = stratified_sample(data, sample_size, strata)
+    tasks = [
+        (position, name, tuple(args), dict(kwargs), out_dir, fmt, dpi)
+        for position, (name, args, kwargs) in enumerate(plots)
+    ]
+    max_workers = None if n_jobs in (None, -1) else n_jobs
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=(data,)
+    ) as pool:
+        results = list(pool.map(_render, tasks))
+    return _write_index(results, out_dir, title)
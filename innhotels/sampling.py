@@ -0,0 +1,145 @@
+"""
+Reproducible stratified sampling of booking extracts in one streaming pass
+"""
+
+import numpy as np
+import pandas as pd
+
+from innhotels.loader import DEFAULT_DATA_PATH, concat_chunks, iter_booking_chunks
+
+# strata of the EDA sample; market_segment_type can be added for rarer segments
+DEFAULT_STRATA = ["booking_status"]
+
+
+class StratifiedReservoir:
+    """
+    Reservoir sample of every stratum of a stream of bookings
+
+    Each booking gets a random key from a seeded generator and every stratum keeps
+    the size bookings with the smallest keys, which is a uniform sample without
+    replacement of the stratum (reservoir sampling with random priorities). Chunks
+    are processed in a vectorised way, only the bookings whose key beats their
+    stratum's current threshold are kept for the merge, and the sample doesn't depend
+    on the chunk size.
+
+    size: size of the final sample, and most bookings kept per stratum
+    strata: columns defining the strata (default DEFAULT_STRATA)
+    seed: seed of the random keys (default 1)
+    """
+
+    def __init__(self, size, strata=None, seed=1):
+        self.size = int(size)
+        self.strata = list(DEFAULT_STRATA if strata is None else strata)
+        self.rng = np.random.default_rng(seed)
+        self.seen = 0
+        self.counts = None  # bookings seen per stratum
+        self.thresholds = None  # largest kept key of every full stratum
+        self.kept = []  # kept bookings with their "_key" and stream "_position"
+
+    def _index(self, frame):
+        """
+        Stratum of every row, as an index that aligns with counts and thresholds
+        """
+        if len(self.strata) == 1:
+            return pd.Index(frame[self.strata[0]].to_numpy(), name=self.strata[0])
+        return pd.MultiIndex.from_frame(frame[self.strata])
+
+    def update(self, chunk):
+        """
+        Add a chunk of bookings to the stream
+
+        chunk: dataframe with the strata columns
+        """
+        keys = self.rng.random(len(chunk))
+        strata = self._index(chunk)
+        counts = pd.Series(1, index=strata).groupby(level=self.strata).sum()
+        if self.counts is not None:
+            counts = self.counts.add(counts, fill_value=0).astype(np.int64)
+        self.counts = counts
+
+        # bookings that can't enter their stratum's full reservoir are skipped
+        limits = 1.0
+        if self.thresholds is not None:
+            limits = self.thresholds.reindex(strata).fillna(1.0).to_numpy()
+        candidates = np.flatnonzero(keys < limits)
+        if len(candidates):
+            rows = chunk.iloc[candidates].reset_index(drop=True)
+            rows["_key"] = keys[candidates]
+            rows["_position"] = self.seen + candidates
+            self.kept.append(rows)
+            self._trim()
+        self.seen += len(chunk)
+        return self
+
+    def _trim(self):
+        """
+        Keep the size smallest keys of every stratum and refresh the thresholds
+        """
+        kept = concat_chunks(self.kept).sort_values("_key", kind="stable")
+        kept = kept.groupby(self.strata, observed=True, sort=False).head(self.size)
+        self.kept = [kept.reset_index(drop=True)]
+        keys = pd.Series(kept["_key"].to_numpy(), index=self._index(kept))
+        full = keys.groupby(level=self.strata).agg(["size", "max"])
+        self.thresholds = full.loc[full["size"] >= self.size, "max"]
+
+    def allocation(self, size=None):
+        """
+        Bookings drawn from each stratum, proportional to its share of the stream
+
+        size: size of the sample (default None, i.e., the reservoir size)
+        """
+        size = self.size if size is None else min(int(size), self.size)
+        total = self.counts.sum()
+        if total <= size:
+            return self.counts.copy()
+        # largest remainder rounding so the allocation adds up to size
+        exact = self.counts * size / total
+        alloc = np.floor(exact).astype(np.int64)
+        remainder = (exact - alloc).sort_values(ascending=False, kind="stable")
+        alloc[remainder.index[: size - alloc.sum()]] += 1
+        return alloc
+
+    def sample(self, size=None):
+        """
+        Stratified sample of the stream, in stream order
+
+        size: size of the sample (default None, i.e., the reservoir size)
+        """
+        if not self.kept:  # also covers an empty stream
+            raise ValueError("No bookings were added to the reservoir")
+        kept = self.kept[0]  # sorted by key after every update
+        rank = kept.groupby(self.strata, observed=True, sort=False).cumcount().to_numpy()
+        quota = self.allocation(size).reindex(self._index(kept)).to_numpy()
+        sample = kept.loc[rank < quota].sort_values("_position")
+        return sample.drop(columns=["_key", "_position"]).reset_index(drop=True)
+
+
+def stratified_sample(data, size, strata=None, seed=1):
+    """
+    Stratified sample of a dataframe or of an iterable of chunks
+
+    data: dataframe, or iterable of dataframes
+    size: size of the sample
+    strata: columns defining the strata (default DEFAULT_STRATA)
+    seed: seed of the sample (default 1)
+    """
+    reservoir = StratifiedReservoir(size, strata, seed)
+    for chunk in [data] if isinstance(data, pd.DataFrame) else data:
+        reservoir.update(chunk)
+    return reservoir.sample()
+
+
+def sample_bookings(
+    path=DEFAULT_DATA_PATH, size=100_000, strata=None, seed=1, chunksize=500_000
+):
+    """
+    Stratified sample of the raw extract(s), streamed chunk by chunk
+
+    path: path or glob of the raw extract(s)
+    size: size of the sample
+    strata: columns defining the strata (default DEFAULT_STRATA)
+    seed: seed of the sample (default 1)
+    chunksize: number of rows per chunk
+    """
+    chunks = iter_booking_chunks(path, chunksize=chunksize)
+    return stratified_sample(chunks, size, strata, seed)
@@ -0,0 +1,135 @@
+"""
+Compact column types for the booking dataset and a per-column memory report
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# smallest types that hold the documented value ranges of each column
+COMPACT_DTYPES = {
+    "no_of_adults": "uint8",
+    "no_of_children": "uint8",
+    "no_of_weekend_nights": "uint8",
+    "no_of_week_nights": "uint8",
+    "type_of_meal_plan": "category",
+    "required_car_parking_space": "uint8",
+    "room_type_reserved": "category",
+    "lead_time": "uint16",
+    "arrival_year": "uint16",
+    "arrival_month": "uint8",
+    "arrival_date": "uint8",
+    "market_segment_type": "category",
+    "repeated_guest": "uint8",
+    "no_of_previous_cancellations": "uint16",
+    "no_of_previous_bookings_not_canceled": "uint16",
+    "avg_price_per_room": "float32",
+    "no_of_special_requests": "uint8",
+}
+
+# object columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+def _fits(series, dtype):
+    """
+    Check that every value of an integer series can be stored in dtype
+
+    series: integer series
+    dtype: target integer type
+    """
+    info = np.iinfo(dtype)
+    return series.empty or (series.min() >= info.min and series.max() <= info.max)
+
+
+def compact_dtype(series, dtype=None):
+    """
+    Cast a series to a compact type
+
+    series: column to cast
+    dtype: target type (default None, i.e., pick one automatically)
+    """
+    if dtype == "category" or (
+        dtype is None
+        and (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series))
+        and series.nunique() <= CATEGORY_MAX_UNIQUE_RATIO * len(series)
+    ):
+        return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype("category")
+
+    if dtype is not None and np.dtype(dtype).kind in "iu":
+        if not pd.api.types.is_integer_dtype(series):
+            raise TypeError(
+                "Column {} is {}, expected integers".format(series.name, series.dtype)
+            )
+        if _fits(series, dtype):
+            return series.astype(dtype)
+        # never wrap values around, fall back to the smallest type that holds them
+        warnings.warn(
+            "Column {} does not fit in {}, downcasting automatically".format(
+                series.name, dtype
+            )
+        )
+        dtype = None
+
+    if dtype is not None:
+        return series.astype(dtype)
+    if pd.api.types.is_integer_dtype(series):
+        downcast = "unsigned" if series.empty or series.min() >= 0 else "integer"
+        return pd.to_numeric(series, downcast=downcast)
+    return series  # floats are only narrowed when listed in COMPACT_DTYPES
+
+
+def apply_schema(data, dtypes=None):
+    """
+    Cast every column of a booking dataframe to its compact type
+
+    data: dataframe
+    dtypes: column types to apply (default COMPACT_DTYPES), other columns are downcast automatically
+    """
+    dtypes = COMPACT_DTYPES if dtypes is None else dtypes
+    return pd.DataFrame(
+        {col: compact_dtype(data[col], dtypes.get(col)) for col in data.columns},
+        index=data.index,
+    )
+
+
+def memory_report(before, after):
+    """
+    Memory used by each column before and after compaction
+
+    before: original dataframe
+    after: compacted dataframe
+    """
+    report = pd.DataFrame(
+        {
+            "dtype_before": before.dtypes.astype(str),
+            "dtype_after": after.dtypes.astype(str),
+            "bytes_before": before.memory_usage(index=False, deep=True),
+            "bytes_after": after.memory_usage(index=False, deep=True),
+        }
+    )
+    report["reduction"] = report["bytes_before"] / report["bytes_after"]
+    return report
+
+
+def optimize_dtypes(data, dtypes=None, report=True):
+    """
+    Compact a booking dataframe and print the memory saved per column
+
+    data: dataframe
+    dtypes: column types to apply (default COMPACT_DTYPES)
+    report: whether to print the memory report (default True)
+    """
+    compact = apply_schema(data, dtypes)
+    if report:
+        mem = memory_report(data, compact)
+        print(mem.to_string())
+        print(
+            "memory usage: {:.2f} MB -> {:.2f} MB ({:.1f}x smaller)".format(
+                mem["bytes_before"].sum() / 1024 ** 2,
+                mem["bytes_after"].sum() / 1024 ** 2,
+                mem["bytes_before"].sum() / mem["bytes_after"].sum(),
+            )
+        )
+    return compact
@@ -0,0 +1,264 @@
+"""
+Lightweight scoring of new bookings with an exported logistic regression
+
+Only numpy and the standard library are imported here, so batch jobs and short-lived
+containers can score without paying for pandas, statsmodels, sklearn or the plotting
+libraries. Bookings can be given as a dataframe, a dict of columns or a list of records.
+
+    python -m innhotels.scoring model.json bookings.csv -o scores.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+MODEL_VERSION = 1
+
+DEFAULT_MODEL_PATH = "logit_model.json"
+
+
+def export_logit(
+    model, encoder, path=DEFAULT_MODEL_PATH, threshold=0.5, upper_whisker=None, params=None
+):
+    """
+    Save a fitted logit model with everything needed to score raw bookings as JSON
+
+    model: fitted statsmodels Logit results, fit_logit results (or anything with a named
+        params series)
+    encoder: fitted DummyEncoder the model's predictors were encoded with
+    path: destination file
+    threshold: probability above which a booking is predicted as canceled (default 0.5)
+    upper_whisker: cap assigned to outlier prices (default None, i.e., prices are not capped)
+    params: overrides of the cleaning parameters (default None, i.e., CLEANING_PARAMS)
+    """
+    from innhotels.cache import CLEANING_PARAMS
+
+    names = list(model.params.index)
+    dummies = {}
+    for col, levels in encoder.levels_.items():
+        for level in levels:
+            dummies["{}_{}".format(col, level)] = [col, str(level)]
+
+    features = []
+    for name in names:
+        if name == "const":
+            features.append({"name": name, "kind": "const"})
+        elif name in encoder.numeric_columns_:
+            features.append({"name": name, "kind": "numeric", "column": name})
+        elif name in dummies:
+            col, level = dummies[name]
+            features.append({"name": name, "kind": "dummy", "column": col, "level": level})
+        else:
+            raise KeyError("Model predictor not produced by the encoder: " + name)
+
+    cleaning = {**CLEANING_PARAMS, **(params or {})}
+    spec = {
+        "version": MODEL_VERSION,
+        "model": "logit",
+        "features": features,
+        "coefficients": [float(value) for value in model.params.to_numpy()],
+        "threshold": float(threshold),
+        "cleaning": {
+            "upper_whisker": None if upper_whisker is None else float(upper_whisker),
+            "outlier_price": cleaning["outlier_price"],
+            "children_outliers": list(cleaning["children_outliers"]),
+            "children_cap": cleaning["children_cap"],
+        },
+    }
+    if hasattr(model, "cov_params"):
+        # information matrix and sample size, for online updates of the coefficients
+        information = np.linalg.pinv(np.asarray(model.cov_params(), dtype=np.float64))
+        spec["information"] = information.tolist()
+        spec["nobs"] = float(model.nobs)
+    save_spec(spec, path)
+    return LogitScorer(spec)
+
+
+def save_spec(spec, path=DEFAULT_MODEL_PATH):
+    """
+    Write a model specification atomically, so a scoring job never reads half a file
+
+    spec: model specification as written by export_logit
+    path: destination file
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(spec, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _columns(data):
+    """
+    Column access for a dataframe, a dict of columns or a list of records
+    """
+    if isinstance(data, (list, tuple)):
+        keys = data[0].keys() if data else []
+        return {key: [record.get(key) for record in data] for key in keys}
+    return data
+
+
+class LogitScorer:
+    """
+    Scores raw bookings with an exported logistic regression
+
+    Applies the notebook's price and children cleaning, builds only the predictors the
+    model uses and evaluates the logistic function with numpy.
+
+    spec: model specification as written by export_logit
+    """
+
+    def __init__(self, spec):
+        if spec.get("version") != MODEL_VERSION:
+            raise ValueError("Unsupported model file version: " + str(spec.get("version")))
+        self.spec = spec
+        self.features = spec["features"]
+        self.coefficients = np.asarray(spec["coefficients"], dtype=np.float64)
+        self.threshold = spec["threshold"]
+        self.cleaning = spec["cleaning"]
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH):
+        """
+        Load a model file written by export_logit
+
+        path: model file
+        """
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @property
+    def feature_names(self):
+        return [feature["name"] for feature in self.features]
+
+    @property
+    def columns(self):
+        """
+        Raw booking columns the model reads
+        """
+        names = []
+        for feature in self.features:
+            col = feature.get("column")
+            if col is not None and col not in names:
+                names.append(col)
+        return names
+
+    def _numeric(self, col, values):
+        values = np.asarray(values, dtype=np.float64)
+        cleaning = self.cleaning
+        if col == "avg_price_per_room" and cleaning["upper_whisker"] is not None:
+            values = np.where(
+                values >= cleaning["outlier_price"], cleaning["upper_whisker"], values
+            )
+        elif col == "no_of_children":
+            outliers = np.isin(values, cleaning["children_outliers"])
+            values = np.where(outliers, cleaning["children_cap"], values)
+        return values
+
+    def transform(self, data):
+        """
+        Predictor matrix of the model, in the model's column order
+
+        data: dataframe, dict of columns or list of records of raw bookings
+        """
+        data = _columns(data)
+        missing = [col for col in self.columns if col not in data]
+        if missing:
+            raise KeyError("Columns missing from the data: " + ", ".join(missing))
+
+        numeric, labels = {}, {}
+        for feature in self.features:
+            col = feature.get("column")
+            if feature["kind"] == "numeric" and col not in numeric:
+                numeric[col] = self._numeric(col, data[col])
+            elif feature["kind"] == "dummy" and col not in labels:
+                # levels are compared as text, so csv strings and categoricals score alike
+                labels[col] = np.asarray(data[col]).astype(str)
+
+        n_rows = len(data[self.columns[0]])
+        X = np.empty((n_rows, len(self.features)), dtype=np.float64)
+        for j, feature in enumerate(self.features):
+            if feature["kind"] == "const":
+                X[:, j] = 1.0
+            elif feature["kind"] == "numeric":
+                X[:, j] = numeric[feature["column"]]
+            else:
+                X[:, j] = labels[feature["column"]] == feature["level"]
+        return X
+
+    def predict_proba(self, data):
+        """
+        Probability of cancellation of every booking
+
+        data: dataframe, dict of columns or list of records of raw bookings
+        """
+        linear = self.transform(data) @ self.coefficients
+        return 1.0 / (1.0 + np.exp(-linear))
+
+    def predict(self, data, threshold=None):
+        """
+        Predicted booking status (1 = canceled) of every booking
+
+        data: dataframe, dict of columns or list of records of raw bookings
+        threshold: probability cut-off (default None, i.e., the exported threshold)
+        """
+        threshold = self.threshold if threshold is None else threshold
+        return (self.predict_proba(data) > threshold).astype(np.int8)
+
+
+def read_records(path):
+    """
+    Read a booking extract as a dict of columns of strings without pandas
+
+    path: csv file
+    """
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    return {col: [row[j] for row in rows] for j, col in enumerate(header)}
+
+
+def score_file(model_path, in_path, out=None, threshold=None, id_column="Booking_ID"):
+    """
+    Score a booking extract and write the probability and prediction of every booking
+
+    model_path: model file written by export_logit
+    in_path: csv file of raw bookings
+    out: writable text file (default None, i.e., standard output)
+    threshold: probability cut-off (default None, i.e., the exported threshold)
+    id_column: column copied to the output to identify the bookings
+    """
+    scorer = LogitScorer.load(model_path)
+    data = read_records(in_path)
+    proba = scorer.predict_proba(data)
+    threshold = scorer.threshold if threshold is None else threshold
+
+    writer = csv.writer(out or sys.stdout)
+    ids = data.get(id_column)
+    writer.writerow(([id_column] if ids else []) + ["probability", "prediction"])
+    for i, p in enumerate(proba):
+        writer.writerow(([ids[i]] if ids else []) + ["%.6f" % p, int(p > threshold)])
+    return proba
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score bookings with an exported logit model")
+    parser.add_argument("model", help="model file written by export_logit")
+    parser.add_argument("bookings", help="csv file of bookings to score")
+    parser.add_argument("-o", "--output", help="output csv file (default standard output)")
+    parser.add_argument("--threshold", type=float, help="override the exported threshold")
+    args = parser.parse_args(argv)
+
+    if args.output:
+        with open(args.output, "w", newline="") as out:
+            score_file(args.model, args.bookings, out, args.threshold)
+    else:
+        score_file(args.model, args.bookings, threshold=args.threshold)
+
+
+if __name__ == "__main__":
+    main()
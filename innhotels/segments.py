@@ -0,0 +1,156 @@
+"""
+Booking counts, cancellation rate, mean price and revenue at risk by segment
+"""
+
+import numpy as np
+import pandas as pd
+
+# dimensions of the finest segments, every table is rolled up from them
+SEGMENT_DIMS = [
+    "arrival_month",
+    "market_segment_type",
+    "room_type_reserved",
+    "type_of_meal_plan",
+]
+
+# above this many possible segments the occurring ones are found by sorting instead
+DENSE_CELL_LIMIT = 1 << 20
+
+
+class SegmentAnalytics:
+    """
+    Segment metrics of a booking dataset, computed in one vectorised pass
+
+    Every booking is mapped once to its finest segment (one level of each dimension),
+    and the sums of every measure per segment come from one bincount each. Tables by
+    any subset of the dimensions, optionally restricted to some levels, are rolled up
+    from the few hundred segments instead of the bookings, and the roll-up indexes are
+    cached so repeated slicing is cheap.
+
+    Revenue at risk is avg_price_per_room * (no_of_week_nights + no_of_weekend_nights)
+    of the canceled bookings.
+
+    data: dataframe of bookings
+    dims: segment dimensions (default SEGMENT_DIMS)
+    target: name of the target column, canceled bookings are "Canceled" or 1
+    """
+
+    def __init__(self, data, dims=None, target="booking_status"):
+        self.dims = list(SEGMENT_DIMS if dims is None else dims)
+        self.target = target
+
+        codes, self.levels = [], {}
+        for dim in self.dims:
+            dim_codes, levels = pd.factorize(data[dim], sort=True)
+            codes.append(dim_codes)
+            self.levels[dim] = levels
+        codes = np.vstack(codes)
+        valid = (codes >= 0).all(axis=0)  # bookings with a missing level are left out
+        shape = tuple(len(self.levels[dim]) for dim in self.dims)
+        flat = np.ravel_multi_index(codes[:, valid], shape)
+
+        size = int(np.prod(shape))
+        if size <= DENSE_CELL_LIMIT:
+            cell_of_row, n_cells = flat, size  # every possible segment, compressed below
+        else:
+            cells, cell_of_row = np.unique(flat, return_inverse=True)
+            n_cells = len(cells)
+
+        status = data[target]
+        positive = "Canceled" if not pd.api.types.is_numeric_dtype(status) else 1
+        canceled = (status.to_numpy() == positive)[valid]
+        price = data["avg_price_per_room"].to_numpy(dtype=np.float64)[valid]
+        nights = (
+            data["no_of_week_nights"].to_numpy(dtype=np.float64)
+            + data["no_of_weekend_nights"].to_numpy(dtype=np.float64)
+        )[valid]
+        revenue = price * nights
+
+        self.sums = {
+            "bookings": np.bincount(cell_of_row, minlength=n_cells).astype(np.float64),
+            "canceled": np.bincount(cell_of_row, weights=canceled, minlength=n_cells),
+            "price": np.bincount(cell_of_row, weights=price, minlength=n_cells),
+            "revenue": np.bincount(cell_of_row, weights=revenue, minlength=n_cells),
+            "revenue_at_risk": np.bincount(
+                cell_of_row, weights=np.where(canceled, revenue, 0.0), minlength=n_cells
+            ),
+        }
+        if size <= DENSE_CELL_LIMIT:
+            # only the segments that occur are kept, the others would be empty rows
+            cells = np.flatnonzero(self.sums["bookings"])
+            self.sums = {name: values[cells] for name, values in self.sums.items()}
+        self.cell_codes = np.vstack(np.unravel_index(cells, shape))  # dims x segments
+        self._rollups = {}
+        self._masks = {}
+
+    def _rollup(self, by):
+        """
+        Group of every finest segment and the levels of each group, cached per dimensions
+        """
+        if by not in self._rollups:
+            if by:
+                positions = [self.dims.index(dim) for dim in by]
+                groups, group_of_cell = np.unique(
+                    self.cell_codes[positions], axis=1, return_inverse=True
+                )
+                index = pd.MultiIndex.from_arrays(
+                    [self.levels[dim][codes] for dim, codes in zip(by, groups)], names=by
+                )
+                if len(by) == 1:
+                    index = index.get_level_values(0)
+            else:
+                group_of_cell = np.zeros(self.cell_codes.shape[1], dtype=np.int64)
+                index = pd.Index(["All"])
+            self._rollups[by] = (group_of_cell.ravel(), index)
+        return self._rollups[by]
+
+    def _mask(self, dim, values):
+        """
+        Finest segments with one of the given levels of a dimension, cached
+        """
+        values = tuple(values) if isinstance(values, (list, tuple, set)) else (values,)
+        key = (dim, values)
+        if key not in self._masks:
+            codes = self.levels[dim].get_indexer(list(values))
+            cell_codes = self.cell_codes[self.dims.index(dim)]
+            self._masks[key] = np.isin(cell_codes, codes[codes >= 0])
+        return self._masks[key]
+
+    def table(self, by=None, **where):
+        """
+        Metrics per level of the given dimensions
+
+        by: dimension or list of dimensions (default None, i.e., one row for all bookings)
+        where: levels to keep per dimension, e.g. market_segment_type="Online" or
+            arrival_month=[10, 11, 12]
+        """
+        by = () if by is None else (by,) if isinstance(by, str) else tuple(by)
+        unknown = [dim for dim in list(by) + list(where) if dim not in self.dims]
+        if unknown:
+            raise KeyError("Not a segment dimension: " + ", ".join(unknown))
+
+        group_of_cell, index = self._rollup(by)
+        keep = np.ones(len(group_of_cell), dtype=bool)
+        for dim, values in where.items():
+            keep &= self._mask(dim, values)
+        sums = {
+            name: np.bincount(
+                group_of_cell[keep], weights=values[keep], minlength=len(index)
+            )
+            for name, values in self.sums.items()
+        }
+
+        bookings = sums["bookings"]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = pd.DataFrame(
+                {
+                    "bookings": bookings.astype(np.int64),
+                    "canceled": sums["canceled"].astype(np.int64),
+                    "cancellation_rate": sums["canceled"] / bookings,
+                    "mean_price": sums["price"] / bookings,
+                    "revenue": sums["revenue"],
+                    "revenue_at_risk": sums["revenue_at_risk"],
+                },
+                index=index,
+            )
+        return result[bookings > 0]  # groups emptied by the filters are dropped
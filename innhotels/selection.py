@@ -0,0 +1,365 @@
+"""
+Feature selection of the logistic regression
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from innhotels.logit import DEFAULT_CHUNKSIZE, _irls, _pass
+
+
+class SelectionResult:
+    """
+    Outcome of a feature selection
+
+    selected_features: kept predictors, in the order of the design
+    params: coefficients of the last fit, indexed by selected_features
+    steps: dataframe with one row per fit (dropped predictor, its p-value, number of
+        predictors, Newton iterations and seconds)
+    """
+
+    def __init__(self, selected_features, params, steps):
+        self.selected_features = selected_features
+        self.params = params
+        self.steps = steps
+
+    def __repr__(self):
+        return "SelectionResult({} features, {} fits, {:.2f}s)".format(
+            len(self.selected_features), len(self.steps), self.steps["seconds"].sum()
+        )
+
+
+def _as_design(X, columns=None):
+    """
+    Column names and one float64 column-major copy of the design, owned by the selection
+    """
+    if isinstance(X, pd.DataFrame):
+        names = list(X.columns) if columns is None else list(columns)
+        values = X[names].to_numpy() if columns is not None else X.to_numpy()
+    else:
+        values = np.asarray(X)
+        names = list(range(values.shape[1])) if columns is None else list(columns)
+    return names, np.array(values, dtype=np.float64, order="F")
+
+
+def _fit_logit(y, X, start_params, maxiter):
+    """
+    Logit fit, warm-started when start_params is given
+
+    A warm start from coefficients that diverge (e.g. quasi-separated dummies) can make
+    the Hessian singular or stop short of convergence; the fit is then redone from
+    statsmodels' own starting point, as a cold fit would have been.
+    """
+    import statsmodels.api as sm
+
+    model = sm.Logit(y, X)
+    if start_params is not None:
+        try:
+            result = model.fit(start_params=start_params, disp=False, maxiter=maxiter)
+            if result.mle_retvals.get("converged", True):
+                return result
+        except np.linalg.LinAlgError:
+            pass
+    return model.fit(disp=False, maxiter=maxiter)
+
+
+def backward_elimination(
+    X, y, max_p_value=0.05, columns=None, warm_start=True, maxiter=35
+):
+    """
+    Drop the predictor with the highest p-value, one at a time, until all are significant
+
+    Gives the same selected_features as refitting sm.Logit on X[cols] after every drop,
+    with less work per step:
+    - the design is copied once into a column-major matrix whose first columns are the
+      active predictors; a dropped column is swapped with the last active one, so every
+      fit runs on a contiguous view without copying the remaining columns
+    - every fit starts from the previous converged coefficients without the dropped
+      one, so Newton's method needs a few iterations instead of a full fit
+
+    X: design dataframe (the constant, if any, included) or array
+    y: target
+    max_p_value: predictors with a larger p-value are dropped (default 0.05)
+    columns: predictors to start from (default None, i.e., every column of X)
+    warm_start: start every fit from the previous coefficients (default True)
+    maxiter: most Newton iterations per fit (default 35, as in statsmodels)
+    """
+    names, work = _as_design(X, columns)
+    y = np.asarray(y, dtype=np.float64)
+    position = list(range(len(names)))  # original position of every working column
+    n_active = len(names)
+    params = None
+    steps = []
+
+    while n_active > 0:
+        start = time.perf_counter()
+        result = _fit_logit(y, work[:, :n_active], params, maxiter)
+        p_values = np.asarray(result.pvalues)
+        # ties go to the predictor that comes first in the design, like idxmax on X[cols]
+        worst = np.flatnonzero(p_values == p_values.max())
+        j = min(worst, key=position.__getitem__)
+        drop = p_values[j] > max_p_value
+        steps.append(
+            {
+                "n_features": n_active,
+                "dropped": names[position[j]] if drop else None,
+                "p_value": p_values[j],
+                "iterations": result.mle_retvals.get("iterations"),
+                "seconds": time.perf_counter() - start,
+            }
+        )
+        if not drop:
+            break
+
+        # the dropped column and its coefficient move just past the active ones
+        last = n_active - 1
+        if j != last:
+            work[:, [j, last]] = work[:, [last, j]]
+            position[j], position[last] = position[last], position[j]
+        params = None
+        if warm_start and result.mle_retvals.get("converged", True):
+            params = np.array(result.params, dtype=np.float64)
+            params[j] = params[last]
+            params = params[:last]
+        n_active = last
+
+    # back to the order of the design
+    kept = sorted(range(n_active), key=position.__getitem__)
+    selected_features = [names[position[i]] for i in kept]
+    final = np.asarray(result.params)[kept] if n_active else []
+    final = pd.Series(final, index=selected_features, dtype=np.float64)
+    return SelectionResult(selected_features, final, pd.DataFrame(steps))
+
+
+# criteria of stepwise_selection
+CRITERIA = ("aic", "bic", "lrt")
+
+_worker_design = None
+
+
+def newton_logit(X, y, start_params=None, maxiter=35, tol=1e-8):
+    """
+    Logit fit by Newton's method, returning the coefficients and the log-likelihood only
+
+    Used to score the many candidate models of a stepwise search, where statsmodels'
+    standard errors and summaries are not needed. The Newton steps (with step halving)
+    are the IRLS backend's of innhotels.logit. A warm start that fits worse than
+    statsmodels' own starting point (all zeros) is replaced by it, e.g. when the
+    constant is dropped.
+
+    X: design array
+    y: 0/1 target array
+    start_params: starting coefficients (default None, i.e., zeros)
+    maxiter: most Newton iterations (default 35)
+    tol: convergence tolerance on the largest coefficient change (default 1e-8)
+    """
+    y = np.asarray(y, dtype=np.float64)
+    params = np.zeros(X.shape[1])
+    if start_params is not None:
+        warm = np.array(start_params, dtype=np.float64)
+        warm_llf = _pass(X, y, warm, DEFAULT_CHUNKSIZE, None, hessian=False)[0]
+        if warm_llf > len(y) * np.log(0.5):  # the log-likelihood at zeros
+            params = warm
+    params, llf, _, _, converged = _irls(
+        X, y, params, DEFAULT_CHUNKSIZE, None, maxiter, tol
+    )
+    return params, llf, converged
+
+
+def _init_worker(X, y):
+    global _worker_design
+    _worker_design = (X, y)
+
+
+def _score_candidate(task):
+    columns, start_params, maxiter = task
+    X, y = _worker_design
+    params, llf, converged = newton_logit(X[:, columns], y, start_params, maxiter)
+    return columns, params, llf, converged
+
+
+def _criterion(criterion, llf, n_params, n_obs):
+    if criterion == "bic":
+        return -2.0 * llf + n_params * np.log(n_obs)
+    return -2.0 * llf + 2.0 * n_params  # aic, also reported by the lrt search
+
+
+def stepwise_selection(
+    X,
+    y,
+    criterion="aic",
+    direction="both",
+    start=None,
+    include=None,
+    alpha_in=0.05,
+    alpha_out=0.05,
+    n_jobs=None,
+    maxiter=35,
+    max_steps=None,
+):
+    """
+    Stepwise selection of the logit predictors, fitting the candidates of a step concurrently
+
+    At every step each possible drop (and add) is fitted in a process pool and the best
+    candidate is taken if it improves the model:
+    - "aic" / "bic": lowest information criterion
+    - "lrt": drop the predictor with the largest likelihood-ratio p-value above
+      alpha_out, otherwise add the one with the smallest p-value below alpha_in
+    The workers receive the column-major design once, and every candidate starts from
+    the current coefficients (without the dropped predictor, or with a zero for the
+    added one), so a candidate fit takes a few Newton iterations.
+
+    X: design dataframe (the constant, if any, included)
+    y: target
+    criterion: "aic", "bic" or "lrt" (default "aic")
+    direction: "backward", "forward" or "both" (default "both")
+    start: predictors of the first model (default None, i.e., every column for backward
+        and both, only include for forward)
+    include: predictors that are never dropped (default None, i.e., ["const"] when the
+        design has it, so the selected model keeps its intercept)
+    alpha_in: p-value below which the lrt search adds a predictor (default 0.05)
+    alpha_out: p-value above which the lrt search drops a predictor (default 0.05)
+    n_jobs: number of worker processes (default None, i.e., one per core; 1 runs inline)
+    maxiter: most Newton iterations per candidate (default 35)
+    max_steps: most steps (default None, i.e., until no candidate improves the model)
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(
+            "criterion must be one of {}, got {!r}".format(CRITERIA, criterion)
+        )
+    if direction not in ("backward", "forward", "both"):
+        raise ValueError("direction must be 'backward', 'forward' or 'both'")
+
+    names, work = _as_design(X)
+    y = np.asarray(y, dtype=np.float64)
+    n_obs = len(y)
+    position = {name: i for i, name in enumerate(names)}
+    if include is None:
+        include = ["const"] if "const" in position else []
+    include = [position[name] for name in include]
+    if start is None:
+        start = include if direction == "forward" else list(range(len(names)))
+    else:
+        start = sorted(set(position[name] for name in start) | set(include))
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    max_workers = os.cpu_count() if n_jobs in (None, -1) else n_jobs
+    pool = None
+    if max_workers > 1:
+        # the design is sent once to every worker, the tasks only carry column indexes
+        pool = ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, initargs=(work, y)
+        )
+    else:
+        _init_worker(work, y)
+
+    def run(tasks):
+        if pool is None:
+            return [_score_candidate(task) for task in tasks]
+        chunksize = max(1, len(tasks) // (4 * max_workers))
+        return list(pool.map(_score_candidate, tasks, chunksize=chunksize))
+
+    try:
+        steps = []
+        begin = time.perf_counter()
+        current = tuple(start)
+        (_, params, llf, _), = run([(current, None, maxiter)])
+        steps.append(
+            {
+                "n_features": len(current),
+                "action": None,
+                "feature": None,
+                "llf": llf,
+                "criterion": _criterion(criterion, llf, len(current), n_obs),
+                "candidates": 1,
+                "seconds": time.perf_counter() - begin,
+            }
+        )
+        seen = {current}
+
+        while max_steps is None or len(steps) <= max_steps:
+            begin = time.perf_counter()
+            tasks = []
+            if direction in ("backward", "both"):
+                for j, col in enumerate(current):
+                    if col in include:
+                        continue
+                    columns = current[:j] + current[j + 1:]
+                    if columns and columns not in seen:
+                        tasks.append((columns, np.delete(params, j), maxiter))
+            if direction in ("forward", "both"):
+                for col in range(len(names)):
+                    if col in current:
+                        continue
+                    columns = tuple(sorted(current + (col,)))
+                    if columns not in seen:
+                        j = columns.index(col)
+                        tasks.append((columns, np.insert(params, j, 0.0), maxiter))
+            if not tasks:
+                break
+            results = run(tasks)
+
+            best = _best_candidate(
+                criterion, current, llf, results, n_obs, alpha_in, alpha_out
+            )
+            if best is None:
+                break
+            columns, params, llf, _ = best
+            action = "drop" if len(columns) < len(current) else "add"
+            (changed,) = set(current).symmetric_difference(columns)
+            current = columns
+            seen.add(current)
+            steps.append(
+                {
+                    "n_features": len(current),
+                    "action": action,
+                    "feature": names[changed],
+                    "llf": llf,
+                    "criterion": _criterion(criterion, llf, len(current), n_obs),
+                    "candidates": len(tasks),
+                    "seconds": time.perf_counter() - begin,
+                }
+            )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        _init_worker(None, None)
+
+    selected_features = [names[col] for col in current]
+    params = pd.Series(params, index=selected_features, dtype=np.float64)
+    return SelectionResult(selected_features, params, pd.DataFrame(steps))
+
+
+def _best_candidate(criterion, current, llf, results, n_obs, alpha_in, alpha_out):
+    """
+    Candidate taken at a stepwise step, None when no candidate improves the model
+    """
+    if criterion == "lrt":
+        from scipy.stats import chi2
+
+        drops, adds = [], []
+        for result in results:
+            columns, _, candidate_llf, _ = result
+            if len(columns) < len(current):
+                # p-value of the dropped predictor: small when the drop loses a lot of fit
+                drops.append((chi2.sf(2.0 * (llf - candidate_llf), 1), result))
+            else:
+                adds.append((chi2.sf(2.0 * (candidate_llf - llf), 1), result))
+        if drops:
+            p_value, result = max(drops, key=lambda item: item[0])
+            if p_value > alpha_out:
+                return result
+        if adds:
+            p_value, result = min(adds, key=lambda item: item[0])
+            if p_value < alpha_in:
+                return result
+        return None
+
+    current_value = _criterion(criterion, llf, len(current), n_obs)
+    values = [_criterion(criterion, result[2], len(result[0]), n_obs) for result in results]
+    best = int(np.argmin(values))
+    return results[best] if values[best] < current_value else None
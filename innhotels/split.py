@@ -0,0 +1,123 @@
+"""
+One train/test split shared by every model family
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class SplitIndex:
+    """
+    Row positions of the train and test sets, computed once
+
+    Uses train_test_split on the row positions, so the rows (and their order) are
+    the same as calling train_test_split on the data with the same arguments.
+
+    n_rows: number of rows in the data
+    test_size: share of rows in the test set (default 0.3)
+    random_state: seed of the shuffle (default 1)
+    stratify: labels to stratify the split on (default None)
+    """
+
+    def __init__(self, n_rows, test_size=0.3, random_state=1, stratify=None):
+        from sklearn.model_selection import train_test_split
+
+        self.train, self.test = train_test_split(
+            np.arange(n_rows),
+            test_size=test_size,
+            random_state=random_state,
+            stratify=stratify,
+        )
+        self.n_rows = n_rows
+        self.test_size = test_size
+        self.random_state = random_state
+
+    @property
+    def order(self):
+        """
+        Row positions with the train rows first and the test rows after
+        """
+        return np.concatenate([self.train, self.test])
+
+    @property
+    def n_train(self):
+        return len(self.train)
+
+
+class DesignMatrix:
+    """
+    Encoded predictors of every row held in one contiguous float matrix
+
+    Rows are stored train first then test, with the constant (if any) as the first
+    column, so the train and test sets of every model family are slices (views) of
+    the same matrix instead of separate copies.
+
+    encoder: fitted DummyEncoder
+    X: dataframe of predictors
+    y: target series
+    split: SplitIndex of the rows of X
+    add_constant: store a leading "const" column for the statsmodels models (default True)
+    """
+
+    def __init__(self, encoder, X, y, split, add_constant=True):
+        if len(X) != split.n_rows:
+            raise ValueError(
+                "The split covers {} rows but X has {}".format(split.n_rows, len(X))
+            )
+        order = split.order
+        self.split = split
+        self.has_constant = add_constant
+        self.feature_names = encoder.get_feature_names(add_constant=add_constant)
+        self.values = encoder.transform_array(X, add_constant=add_constant, rows=order)
+        self.index = X.index[order]
+        self.y = pd.Series(np.asarray(y)[order], index=self.index, name=getattr(y, "name", None))
+        self.frame = pd.DataFrame(
+            self.values, index=self.index, columns=self.feature_names, copy=False
+        )
+
+    def _columns(self, drop_constant, columns):
+        if columns is not None:
+            return list(columns)
+        start = 1 if drop_constant and self.has_constant else 0
+        return slice(start, None)
+
+    def _rows(self, part):
+        n_train = self.split.n_train
+        if part == "train":
+            return slice(0, n_train)
+        if part == "test":
+            return slice(n_train, None)
+        raise ValueError("part must be 'train' or 'test', got " + repr(part))
+
+    def get(self, part, drop_constant=False, columns=None):
+        """
+        Predictors of the train or test set
+
+        part: "train" or "test"
+        drop_constant: leave out the "const" column, e.g. for the sklearn models (default False)
+        columns: names of a subset of columns, returned as a copy (default None, i.e., a view of all)
+        """
+        cols = self._columns(drop_constant, columns)
+        if isinstance(cols, slice):
+            return self.frame.iloc[self._rows(part), cols]
+        return self.frame.iloc[self._rows(part)][cols]
+
+    def train(self, drop_constant=False, columns=None):
+        """
+        Predictors of the train set, see get
+        """
+        return self.get("train", drop_constant, columns)
+
+    def test(self, drop_constant=False, columns=None):
+        """
+        Predictors of the test set, see get
+        """
+        return self.get("test", drop_constant, columns)
+
+    @property
+    def y_train(self):
+        return self.y.iloc[self._rows("train")]
+
+    @property
+    def y_test(self):
+        return self.y.iloc[self._rows("test")]
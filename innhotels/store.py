@@ -0,0 +1,120 @@
+"""
+Memory-mapped store of the encoded train/test matrices for worker processes
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORE_DIR = os.path.join(
+    os.environ.get("INNHOTELS_CACHE", ".innhotels_cache"), "features"
+)
+
+
+def save_feature_store(design, path=DEFAULT_STORE_DIR, drop_constant=False, dtype=None):
+    """
+    Save a DesignMatrix as memory-mappable .npy files and a metadata sidecar
+
+    design: DesignMatrix to save
+    path: directory of the store
+    drop_constant: leave out the "const" column, e.g. for the sklearn models (default False)
+    dtype: type of the stored matrix (default None, i.e., the design's type),
+        float32 avoids the conversion copy the sklearn trees make on every fit
+    """
+    os.makedirs(path, exist_ok=True)
+    start = 1 if drop_constant and design.has_constant else 0
+    for part in ("train", "test"):
+        values = design.get(part, drop_constant=drop_constant).to_numpy()
+        # column-major like the design matrix, so each part is contiguous once mapped
+        values = np.asfortranarray(values, dtype=dtype or values.dtype)
+        np.save(os.path.join(path, "X_{}.npy".format(part)), values)
+    np.save(os.path.join(path, "y_train.npy"), design.y_train.to_numpy())
+    np.save(os.path.join(path, "y_test.npy"), design.y_test.to_numpy())
+    np.save(os.path.join(path, "train_index.npy"), design.split.train)
+    np.save(os.path.join(path, "test_index.npy"), design.split.test)
+    meta = {
+        "feature_names": design.feature_names[start:],
+        "has_constant": design.has_constant and not drop_constant,
+        "n_rows": int(design.split.n_rows),
+        "n_train": int(design.split.n_train),
+        "test_size": design.split.test_size,
+        "random_state": design.split.random_state,
+    }
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return FeatureStore(path)
+
+
+class FeatureStore:
+    """
+    Read-only view of a saved feature store, attached without copying the matrices
+
+    path: directory of the store
+    mmap_mode: numpy memory-map mode (default "r")
+    """
+
+    def __init__(self, path=DEFAULT_STORE_DIR, mmap_mode="r"):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.feature_names = meta["feature_names"]
+        self.has_constant = meta["has_constant"]
+        self.n_train = meta["n_train"]
+        self.arrays = {}
+        for name in ("X_train", "X_test", "y_train", "y_test", "train_index", "test_index"):
+            self.arrays[name] = np.load(
+                os.path.join(path, name + ".npy"), mmap_mode=mmap_mode
+            )
+
+    def get(self, part, frame=False):
+        """
+        Predictors of the train or test set as a memory-mapped array
+
+        part: "train" or "test"
+        frame: wrap the array in a dataframe with the feature names (default False)
+        """
+        if part not in ("train", "test"):
+            raise ValueError("part must be 'train' or 'test', got " + repr(part))
+        X = self.arrays["X_" + part]
+        if frame:
+            return pd.DataFrame(X, columns=self.feature_names, copy=False)
+        return X
+
+    def train(self, frame=False):
+        return self.get("train", frame)
+
+    def test(self, frame=False):
+        return self.get("test", frame)
+
+    @property
+    def y_train(self):
+        return self.arrays["y_train"]
+
+    @property
+    def y_test(self):
+        return self.arrays["y_test"]
+
+    @property
+    def train_index(self):
+        return self.arrays["train_index"]
+
+    @property
+    def test_index(self):
+        return self.arrays["test_index"]
+
+
+def fit_estimator(estimator, path=DEFAULT_STORE_DIR, part="train"):
+    """
+    Fit an sklearn estimator on a feature store, attaching to it from a worker process
+
+    Only the path travels to the worker, the matrices are memory-mapped there.
+
+    estimator: unfitted sklearn estimator
+    path: directory of the store
+    part: rows to fit on, "train" or "test" (default "train")
+    """
+    store = FeatureStore(path)
+    y = store.y_train if part == "train" else store.y_test
+    return estimator.fit(store.get(part, frame=True), y)
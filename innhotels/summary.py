@@ -0,0 +1,212 @@
+"""
+Out-of-core EDA summaries built from mergeable partial aggregates
+"""
+
+import numpy as np
+import pandas as pd
+
+from innhotels.cube import CountCube
+from innhotels.loader import DEFAULT_DATA_PATH, iter_booking_chunks, resolve_paths
+
+# identifiers are never summarised
+SKIP_COLUMNS = ["Booking_ID"]
+
+
+def weighted_quantile(values, counts, q):
+    """
+    Quantile of a column given its distinct values and their counts
+
+    Uses the same linear interpolation as pandas' Series.quantile.
+
+    values: sorted distinct values
+    counts: number of rows holding each value
+    q: quantile or array of quantiles in [0, 1]
+    """
+    values = np.asarray(values, dtype=float)
+    cum = np.cumsum(counts)
+    position = (cum[-1] - 1) * np.asarray(q, dtype=float)
+    lower = np.floor(position)
+    # the k-th smallest row (0 based) holds the first value whose cumulative count exceeds k
+    below = values[np.searchsorted(cum, lower, side="right")]
+    above = values[np.searchsorted(cum, np.minimum(lower + 1, cum[-1] - 1), side="right")]
+    return below + (above - below) * (position - lower)
+
+
+class BookingSummary:
+    """
+    Per-column counts of every value against the target, accumulated chunk by chunk
+
+    Everything data.describe(), value_counts(), pd.crosstab and the monthly groupby
+    print can be derived exactly from these counts, which are small (one row per
+    distinct value and target class) and can be merged across chunks, files or processes.
+    The counts are a CountCube of every column, whatever its cardinality.
+
+    target: name of the target column (default "booking_status")
+    columns: columns to summarise (default None, i.e., every column but Booking_ID)
+    """
+
+    def __init__(self, target="booking_status", columns=None):
+        self.target = target
+        self.columns = None if columns is None else list(columns)
+        self.n_rows = 0
+        self.cube = CountCube(target, self.columns, max_levels=None)
+        self.numeric_columns = []
+
+    def update(self, chunk):
+        """
+        Add the counts of a chunk of bookings
+
+        chunk: dataframe with the target column
+        """
+        if self.columns is None:
+            self.columns = [
+                col for col in chunk.columns if col not in SKIP_COLUMNS and col != self.target
+            ]
+            self.cube.columns = list(self.columns)
+        if not self.numeric_columns:
+            self.numeric_columns = [
+                col
+                for col in self.columns + [self.target]
+                if pd.api.types.is_numeric_dtype(chunk[col])
+            ]
+        self.n_rows += len(chunk)
+        self.cube.update(chunk)
+        return self
+
+    def merge(self, other):
+        """
+        Merge the counts of another summary into this one
+
+        other: BookingSummary of other rows with the same columns
+        """
+        if self.columns is None:
+            self.columns, self.numeric_columns = other.columns, other.numeric_columns
+        self.n_rows += other.n_rows
+        self.cube.merge(other.cube)
+        return self
+
+    def _value_counts(self, col):
+        """
+        Counts of every value of a column, sorted by value
+        """
+        if col == self.target:
+            return self.cube.class_counts().sort_index()
+        return self.cube.tables[col].sum(axis=1).sort_index()
+
+    def value_counts(self, col, normalize=False):
+        """
+        Same as data[col].value_counts()
+
+        col: column name
+        normalize: return shares instead of counts (default False)
+        """
+        counts = self._value_counts(col).sort_values(ascending=False, kind="stable")
+        counts.index.name = col
+        counts.name = "proportion" if normalize else "count"
+        return counts / counts.sum() if normalize else counts
+
+    def group_count(self, col):
+        """
+        Same as data.groupby([col])[target].count()
+
+        col: column name
+        """
+        counts = self._value_counts(col)
+        counts.index.name = col
+        counts.name = self.target
+        return counts
+
+    def crosstab(self, col, margins=False, normalize=False):
+        """
+        Same as pd.crosstab(data[col], data[target], margins=margins, normalize=normalize)
+
+        col: column name
+        margins: add "All" row and column totals (default False)
+        normalize: False, "index", "columns" or "all" (default False)
+        """
+        return self.cube.crosstab(col, margins, normalize)
+
+    def mean(self, col):
+        counts = self._value_counts(col)
+        return np.average(counts.index.to_numpy(dtype=float), weights=counts.to_numpy())
+
+    def median(self, col):
+        return self.quantile(col, 0.5)
+
+    def quantile(self, col, q):
+        """
+        Exact quantile of a numeric column
+
+        col: column name
+        q: quantile or list of quantiles
+        """
+        counts = self._value_counts(col)
+        result = weighted_quantile(counts.index.to_numpy(), counts.to_numpy(), q)
+        return result if np.ndim(q) else float(result)
+
+    def describe(self):
+        """
+        Same table as data.describe() for the numeric columns
+        """
+        stats = {}
+        for col in self.numeric_columns:
+            counts = self._value_counts(col)
+            values = counts.index.to_numpy(dtype=float)
+            weights = counts.to_numpy()
+            n = weights.sum()
+            mean = np.average(values, weights=weights)
+            var = np.sum(weights * (values - mean) ** 2) / (n - 1) if n > 1 else np.nan
+            q1, q2, q3 = weighted_quantile(values, weights, [0.25, 0.5, 0.75])
+            stats[col] = [n, mean, np.sqrt(var), values[0], q1, q2, q3, values[-1]]
+        return pd.DataFrame(
+            stats, index=["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+        )
+
+
+def summarize(chunks, target="booking_status", columns=None):
+    """
+    Build a BookingSummary in a single pass over an iterable of chunks
+
+    chunks: iterable of dataframes, e.g. iter_booking_chunks(path)
+    target: name of the target column (default "booking_status")
+    columns: columns to summarise (default None, i.e., every column but Booking_ID)
+    """
+    summary = BookingSummary(target=target, columns=columns)
+    for chunk in chunks:
+        summary.update(chunk)
+    return summary
+
+
+def _summarize_file(args):
+    path, chunksize, target, columns = args
+    return summarize(iter_booking_chunks(path, chunksize=chunksize), target, columns)
+
+
+def summarize_files(
+    path=DEFAULT_DATA_PATH, chunksize=500_000, target="booking_status", columns=None, n_jobs=1
+):
+    """
+    Summarise partitioned extracts, one file per worker process, and merge the results
+
+    path: path, glob pattern or list of either
+    chunksize: number of rows per chunk
+    target: name of the target column (default "booking_status")
+    columns: columns to summarise (default None, i.e., every column but Booking_ID)
+    n_jobs: number of worker processes (default 1, i.e., no pool)
+    """
+    tasks = [(file, chunksize, target, columns) for file in resolve_paths(path)]
+    if n_jobs == 1 or len(tasks) == 1:
+        parts = map(_summarize_file, tasks)
+        return _merge_all(parts)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=None if n_jobs == -1 else n_jobs) as pool:
+        return _merge_all(pool.map(_summarize_file, tasks))
+
+
+def _merge_all(parts):
+    total = None
+    for part in parts:
+        total = part if total is None else total.merge(part)
+    return total
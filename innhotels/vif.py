@@ -0,0 +1,120 @@
+"""
+Variance inflation factors of every predictor from one factorisation of the correlation matrix
+"""
+
+import numpy as np
+import pandas as pd
+
+# relative size below which a variance (or an eigenvalue) counts as zero
+SINGULAR_TOL = 1e-10
+
+
+class VIFCalculator:
+    """
+    Variance inflation factors of a design, as variance_inflation_factor computes them
+
+    With standardised columns, the VIF of a column is 1 / (1 - R^2) of the regression
+    of the column on all the others with an intercept, which is the diagonal of the
+    inverse of the correlation matrix of the predictors. All the VIFs therefore come
+    from one pass over the rows (the cross-products of the centered columns) and one
+    inversion of a p x p matrix, instead of p regressions over the rows. Constant
+    columns, such as const, are orthogonal to the centered others and have a VIF of 1.
+
+    The inverse comes from a Cholesky factorisation; a near-singular correlation matrix
+    falls back to the eigenvalue pseudo-inverse, and the columns involved in an
+    (almost) exact linear dependency get an infinite VIF. Dropping a column updates
+    the inverse with a rank-one downdate, so iterative pruning costs O(p^2) per drop.
+
+    X: design dataframe (the constant, if any, included)
+    """
+
+    def __init__(self, X):
+        values = X.to_numpy(dtype=np.float64)
+        centered = values - values.mean(axis=0)
+        cross = centered.T @ centered
+        variance = np.diag(cross)
+        # constant columns are left out of the correlation matrix
+        varying = variance > SINGULAR_TOL * np.maximum((values ** 2).sum(axis=0), 1.0)
+        self.constants = [name for name, v in zip(X.columns, varying) if not v]
+        self.names = [name for name, v in zip(X.columns, varying) if v]
+        self.columns = list(X.columns)
+        scale = np.sqrt(variance[varying])
+        self.corr = cross[np.ix_(varying, varying)] / np.outer(scale, scale)
+        self._factorise()
+
+    def _factorise(self):
+        self.exact = True
+        try:
+            factor = np.linalg.cholesky(self.corr)
+            inverse_factor = np.linalg.solve(factor, np.eye(len(self.corr)))
+            self.inverse = inverse_factor.T @ inverse_factor
+            self.dependent = np.zeros(len(self.corr), dtype=bool)
+            # a valid factor of an ill-conditioned matrix still loses all accuracy
+            if len(self.corr) == 0 or np.diag(self.inverse).max() * SINGULAR_TOL < 1:
+                return
+        except np.linalg.LinAlgError:
+            pass
+        # pseudo-inverse from the eigenvalues, dropping the near-zero ones
+        eigenvalues, eigenvectors = np.linalg.eigh(self.corr)
+        null = eigenvalues < SINGULAR_TOL * max(eigenvalues.max(), 1.0)
+        kept = eigenvectors[:, ~null]
+        self.inverse = (kept / eigenvalues[~null]) @ kept.T
+        # columns that take part in a linear dependency can't be regressed on the others
+        loadings = np.abs(eigenvectors[:, null]).max(axis=1)
+        self.dependent = loadings > np.sqrt(SINGULAR_TOL)
+        self.exact = False
+
+    def vif(self):
+        """
+        Variance inflation factor of every column, as a series indexed by the names
+        """
+        values = np.diag(self.inverse).copy()
+        values[self.dependent] = np.inf
+        vif = pd.Series(values, index=self.names, name="VIF")
+        vif = pd.concat([vif, pd.Series(1.0, index=self.constants, name="VIF")])
+        return vif[[col for col in self.columns if col in vif.index]]
+
+    def drop(self, name):
+        """
+        Remove a column and update the inverse, in place
+
+        name: column to remove
+        """
+        self.columns.remove(name)
+        if name in self.constants:
+            self.constants.remove(name)
+            return self
+        j = self.names.index(name)
+        keep = np.arange(len(self.names)) != j
+        pivot = self.inverse[j, j]
+        self.names.pop(j)
+        self.corr = self.corr[np.ix_(keep, keep)]
+        if self.exact and pivot > 0:
+            # inverse of the submatrix: rank-one downdate of the full inverse
+            column = self.inverse[keep, j]
+            self.inverse = (
+                self.inverse[np.ix_(keep, keep)] - np.outer(column, column) / pivot
+            )
+            self.dependent = self.dependent[keep]
+        else:
+            self._factorise()  # dependencies may have gone with the column
+        return self
+
+    def prune(self, threshold=5.0, keep=("const",)):
+        """
+        Drop the column with the highest VIF until all are at most threshold
+
+        Returns the dropped columns with their VIF when they were dropped.
+
+        threshold: largest acceptable VIF (default 5)
+        keep: columns that are never dropped (default ("const",))
+        """
+        dropped = []
+        while True:
+            values = self.vif().drop(labels=[c for c in keep if c in self.columns])
+            if values.empty or values.max() <= threshold:
+                return dropped
+            worst = values.idxmax()
+            dropped.append((worst, values[worst]))
+            self.drop(worst)
+